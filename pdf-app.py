@@ -8,8 +8,15 @@ Inclui módulo de scanner de documentos e todas as funcionalidades de manipulaç
 # ============================================================================
 
 import os
+import io
 import tempfile
-from typing import List, Tuple, Optional, Dict
+import threading
+import hashlib
+import time
+import contextlib
+from collections import defaultdict, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Tuple, Optional, Dict
 from pathlib import Path
 import numpy as np
 from PIL import Image, ImageEnhance, ImageFilter
@@ -21,12 +28,24 @@ except ImportError:
     CV2_AVAILABLE = False
     cv2 = None
 
+# As páginas são processadas em paralelo (uma por núcleo); o OpenMP interno do Tesseract
+# só disputaria os mesmos núcleos. Precisa ser definido antes de carregar a libtesseract
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
 try:
     import pytesseract
     TESSERACT_AVAILABLE = True
 except ImportError:
     TESSERACT_AVAILABLE = False
 
+# tesserocr é opcional: chama a libtesseract em processo, sem iniciar o binário a cada página
+try:
+    import tesserocr
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    tesserocr = None
+    TESSEROCR_AVAILABLE = False
+
 try:
     from pdf2image import convert_from_path
     PDF2IMAGE_AVAILABLE = True
@@ -36,12 +55,92 @@ except ImportError:
 from pypdf import PdfReader
 
 
+class _OcrResultCache:
+    """Cache LRU (com validade) de resultados de OCR, indexado pelo conteúdo da imagem"""
+    
+    def __init__(self, max_entries: int = 512, ttl: float = 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: "OrderedDict[bytes, Tuple[float, Dict]]" = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def get(self, key: bytes) -> Optional[Dict]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return dict(entry[1])
+    
+    def put(self, key: bytes, result: Dict) -> None:
+        with self.lock:
+            self.entries[key] = (time.monotonic(), dict(result))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
 class DocumentScanner:
     """Classe para escanear e processar documentos PDF e imagens"""
     
-    def __init__(self):
-        self.tesseract_available = TESSERACT_AVAILABLE
+    def __init__(self, ocr_cache: Optional[_OcrResultCache] = None):
+        self.tesseract_available = TESSERACT_AVAILABLE or TESSEROCR_AVAILABLE
         self.pdf2image_available = PDF2IMAGE_AVAILABLE
+        # Resultados de OCR por hash da imagem: páginas repetidas não passam de novo pelo Tesseract
+        self.ocr_cache = ocr_cache
+        # Instâncias ociosas do tesserocr por idioma. A API não é thread-safe: cada página
+        # usa uma instância exclusiva, devolvida ao fim; modelos e dados de idioma são
+        # carregados uma vez por instância e reaproveitados entre páginas e reruns
+        self._idle_apis: Dict[str, List] = defaultdict(list)
+        self._apis_lock = threading.Lock()
+    
+    @contextlib.contextmanager
+    def _tesserocr_api(self, lang: str):
+        """Empresta uma instância do tesserocr já inicializada para o idioma"""
+        with self._apis_lock:
+            idle = self._idle_apis[lang]
+            api = idle.pop() if idle else None
+        if api is None:
+            api = tesserocr.PyTessBaseAPI(lang=lang, oem=tesserocr.OEM.DEFAULT)
+        try:
+            yield api
+        finally:
+            with self._apis_lock:
+                self._idle_apis[lang].append(api)
+    
+    @staticmethod
+    def _ocr_cache_key(image: Image.Image, lang: str, preprocess: bool, enhance: bool) -> bytes:
+        """Hash dos pixels da imagem e das opções de OCR (milissegundos, contra centenas do OCR)"""
+        digest = hashlib.blake2b(image.tobytes(), digest_size=16)
+        digest.update(f"{image.mode}|{image.size}|{lang}|{preprocess}|{enhance}".encode())
+        return digest.digest()
+    
+    def _run_tesseract(self, image: Image.Image, lang: str, psm: int) -> Tuple[str, Dict]:
+        """
+        Executa o Tesseract com o modo de segmentação psm
+        
+        Returns:
+            Texto reconhecido e dados com as confianças por palavra (chave 'conf')
+        """
+        if TESSEROCR_AVAILABLE:
+            with self._tesserocr_api(lang) as api:
+                api.SetPageSegMode(psm)
+                api.SetImage(image)
+                text = api.GetUTF8Text()
+                return text, {'conf': api.AllWordConfidences()}
+        
+        config = f'--oem 3 --psm {psm}'
+        text = pytesseract.image_to_string(image, lang=lang, config=config)
+        data = pytesseract.image_to_data(
+            image, 
+            lang=lang, 
+            config=config,
+            output_type=pytesseract.Output.DICT
+        )
+        return text, data
         
     def preprocess_image(self, image: Image.Image, enhance_quality: bool = True) -> Image.Image:
         """
@@ -96,6 +195,9 @@ class DocumentScanner:
         Returns:
             Imagem melhorada
         """
+        if CV2_AVAILABLE and image.mode in ('L', 'RGB'):
+            return self._enhance_image_cv2(image)
+        
         # Aumentar contraste
         enhancer = ImageEnhance.Contrast(image)
         image = enhancer.enhance(1.5)
@@ -110,6 +212,30 @@ class DocumentScanner:
         
         return image
     
+    # Kernel do ImageFilter.SMOOTH, a imagem de referência do ImageEnhance.Sharpness
+    _SMOOTH_KERNEL = np.array([[1, 1, 1], [1, 5, 1], [1, 1, 1]], dtype=np.float32) / 13
+    
+    def _enhance_image_cv2(self, image: Image.Image) -> Image.Image:
+        """
+        Mesmas etapas de enhance_image (contraste 1.5, nitidez 2.0, brilho 1.1)
+        feitas com OpenCV, com saturação em uint8 entre as etapas como no PIL
+        """
+        img = np.asarray(image)
+        
+        # Contraste: afasta cada pixel da média de luminância (como o PIL)
+        gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY) if img.ndim == 3 else img
+        mean = int(gray.mean() + 0.5)
+        img = cv2.addWeighted(img, 1.5, img, 0, -0.5 * mean)
+        
+        # Nitidez: máscara de nitidez contra a versão suavizada
+        smoothed = cv2.filter2D(img, -1, self._SMOOTH_KERNEL, borderType=cv2.BORDER_REPLICATE)
+        img = cv2.addWeighted(img, 2.0, smoothed, -1.0, 0)
+        
+        # Brilho
+        img = cv2.convertScaleAbs(img, alpha=1.1, beta=0)
+        
+        return Image.fromarray(img)
+    
     def extract_text_from_image(
         self, 
         image: Image.Image, 
@@ -131,11 +257,18 @@ class DocumentScanner:
         """
         if not self.tesseract_available:
             raise ImportError(
-                "pytesseract não está instalado. "
+                "pytesseract/tesserocr não está instalado. "
                 "Instale com: pip install pytesseract\n"
                 "E instale o Tesseract OCR: https://github.com/tesseract-ocr/tesseract"
             )
         
+        cache_key = None
+        if self.ocr_cache is not None:
+            cache_key = self._ocr_cache_key(image, lang, preprocess, enhance)
+            cached = self.ocr_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
         # Pré-processar imagem
         if preprocess:
             processed_image = self.preprocess_image(image, enhance_quality=enhance)
@@ -148,12 +281,12 @@ class DocumentScanner:
         
         # Extrair texto usando Tesseract
         # Tentar múltiplas configurações para melhorar detecção
-        configs_to_try = [
-            r'--oem 3 --psm 6',  # Padrão: bloco uniforme de texto
-            r'--oem 3 --psm 11',  # Texto esparso
-            r'--oem 3 --psm 12',  # Texto com OSD
-            r'--oem 3 --psm 3',   # Totalmente automático
-            r'--oem 3 --psm 1',   # Orientação e detecção de script automática
+        psms_to_try = [
+            6,   # Padrão: bloco uniforme de texto
+            11,  # Texto esparso
+            12,  # Texto com OSD
+            3,   # Totalmente automático
+            1,   # Orientação e detecção de script automática
         ]
         
         best_result = {
@@ -164,24 +297,19 @@ class DocumentScanner:
             'data': {}
         }
         
-        for config in configs_to_try:
+        for psm in psms_to_try:
             try:
-                # Extrair texto simples
-                text = pytesseract.image_to_string(processed_image, lang=lang, config=config)
-                
-                # Extrair dados estruturados
-                data = pytesseract.image_to_data(
-                    processed_image, 
-                    lang=lang, 
-                    config=config,
-                    output_type=pytesseract.Output.DICT
-                )
+                # Extrair texto e dados estruturados
+                text, data = self._run_tesseract(processed_image, lang, psm)
                 
-                # Extrair informações de confiança
-                confidences = [int(conf) for conf in data['conf'] if int(conf) > 0]
-                avg_confidence = sum(confidences) / len(confidences) if confidences else 0
+                # Extrair informações de confiança (truncadas para inteiro, como antes;
+                # o pytesseract devolve números ou strings, conforme a versão)
+                confidences = np.asarray(data['conf'], dtype=np.float32).astype(np.int32)
+                confidences = confidences[confidences > 0]
+                avg_confidence = float(confidences.mean()) if confidences.size else 0
                 
-                word_count = len([w for w in text.split() if w.strip()])
+                # split() sem argumentos já descarta espaços, então não há palavras vazias
+                word_count = len(text.split())
                 char_count = len(text.strip())
                 
                 # Se encontrou texto com confiança razoável, usar este resultado
@@ -192,7 +320,7 @@ class DocumentScanner:
                         'word_count': word_count,
                         'char_count': char_count,
                         'data': data,
-                        'config_used': config
+                        'config_used': f'--oem 3 --psm {psm}'
                     }
                     
                     # Se este resultado é melhor que o anterior, usar este
@@ -213,9 +341,9 @@ class DocumentScanner:
         if best_result['word_count'] == 0 and preprocess:
             try:
                 # Tentar com imagem original
-                text = pytesseract.image_to_string(image, lang=lang, config=r'--oem 3 --psm 6')
+                text, _ = self._run_tesseract(image, lang, 6)
                 if text.strip():
-                    word_count = len([w for w in text.split() if w.strip()])
+                    word_count = len(text.split())
                     if word_count > 0:
                         best_result = {
                             'text': text.strip(),
@@ -228,6 +356,10 @@ class DocumentScanner:
             except:
                 pass
         
+        # Falhas do Tesseract podem ser passageiras: só resultados sem erro vão para o cache
+        if cache_key is not None and 'error' not in best_result:
+            self.ocr_cache.put(cache_key, best_result)
+        
         return best_result
     
     def extract_text_from_pdf(
@@ -237,7 +369,9 @@ class DocumentScanner:
         lang: str = 'por',
         dpi: int = 300,
         preprocess: bool = True,
-        enhance: bool = True
+        enhance: bool = True,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        total_pages: Optional[int] = None
     ) -> Dict[str, any]:
         """
         Extrai texto de um PDF usando OCR
@@ -249,6 +383,8 @@ class DocumentScanner:
             dpi: Resolução para conversão de PDF para imagem
             preprocess: Se True, aplica pré-processamento
             enhance: Se True, melhora a qualidade
+            progress_callback: Chamado com (páginas concluídas, total) a cada página
+            total_pages: Número de páginas do PDF, se já conhecido (evita reabri-lo)
             
         Returns:
             Dicionário com texto extraído por página e estatísticas
@@ -260,9 +396,9 @@ class DocumentScanner:
                 "E instale o poppler: https://poppler.freedesktop.org/"
             )
         
-        # Ler PDF
-        reader = PdfReader(pdf_path)
-        total_pages = len(reader.pages)
+        # Contar páginas, a menos que quem chama já saiba
+        if total_pages is None:
+            total_pages = len(PdfReader(pdf_path).pages)
         
         # Determinar páginas para processar
         if pages is None:
@@ -271,9 +407,6 @@ class DocumentScanner:
             # Converter de 1-based para 0-based
             pages_to_process = [p - 1 for p in pages if 1 <= p <= total_pages]
         
-        # Converter PDF para imagens
-        images = convert_from_path(pdf_path, dpi=dpi, first_page=1, last_page=total_pages)
-        
         results = {
             'total_pages': total_pages,
             'processed_pages': len(pages_to_process),
@@ -284,25 +417,60 @@ class DocumentScanner:
             'total_chars': 0
         }
         
-        # Processar cada página
-        for page_idx in pages_to_process:
-            if page_idx < len(images):
-                image = images[page_idx]
-                page_result = self.extract_text_from_image(
-                    image, 
-                    lang=lang, 
-                    preprocess=preprocess, 
-                    enhance=enhance
-                )
-                
-                results['pages'][page_idx + 1] = page_result
-                results['full_text'] += f"\n\n--- Página {page_idx + 1} ---\n\n"
-                results['full_text'] += page_result.get('text', '')
-                results['total_words'] += page_result.get('word_count', 0)
-                results['total_chars'] += page_result.get('char_count', 0)
-                
-                if 'confidence' in page_result:
-                    results['total_confidence'] += page_result['confidence']
+        def ocr_page(page_idx: int, output_dir: str) -> Dict[str, any]:
+            # Rasterizar só esta página, em tons de cinza (o Tesseract não usa cor),
+            # e apagar a imagem logo após o OCR
+            paths = convert_from_path(
+                pdf_path,
+                dpi=dpi,
+                first_page=page_idx + 1,
+                last_page=page_idx + 1,
+                grayscale=True,
+                output_folder=output_dir,
+                output_file=f"p{page_idx:05d}_",
+                paths_only=True
+            )
+            try:
+                with Image.open(paths[0]) as image:
+                    return self.extract_text_from_image(
+                        image,
+                        lang=lang,
+                        preprocess=preprocess,
+                        enhance=enhance
+                    )
+            finally:
+                for path in paths:
+                    os.unlink(path)
+        
+        # Processar as páginas em paralelo: o pdftoppm, o Tesseract (subprocesso do
+        # pytesseract ou tesserocr) e o OpenCV liberam o GIL, então cada thread ocupa
+        # um núcleo. Como cada tarefa rasteriza a própria página, só as páginas
+        # selecionadas são convertidas e no máximo uma imagem por worker fica em memória
+        page_indices = pages_to_process
+        page_results = {}
+        workers = max(1, min(os.cpu_count() or 1, len(page_indices)))
+        with tempfile.TemporaryDirectory(prefix="ocr_pages_") as output_dir, \
+                ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr") as executor:
+            futures = {
+                executor.submit(ocr_page, page_idx, output_dir): page_idx
+                for page_idx in page_indices
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                page_results[futures[future]] = future.result()
+                if progress_callback:
+                    progress_callback(done, len(futures))
+        
+        # Montar o resultado na ordem original das páginas
+        for page_idx in page_indices:
+            page_result = page_results[page_idx]
+            results['pages'][page_idx + 1] = page_result
+            results['full_text'] += f"\n\n--- Página {page_idx + 1} ---\n\n"
+            results['full_text'] += page_result.get('text', '')
+            results['total_words'] += page_result.get('word_count', 0)
+            results['total_chars'] += page_result.get('char_count', 0)
+            
+            if 'confidence' in page_result:
+                results['total_confidence'] += page_result['confidence']
         
         # Calcular confiança média
         if results['processed_pages'] > 0:
@@ -320,7 +488,9 @@ class DocumentScanner:
         dpi: int = 300,
         preprocess: bool = True,
         enhance: bool = True,
-        pages: Optional[List[int]] = None
+        pages: Optional[List[int]] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        total_pages: Optional[int] = None
     ) -> Dict[str, any]:
         """
         Escaneia um documento (PDF ou imagem) e extrai texto
@@ -333,6 +503,8 @@ class DocumentScanner:
             preprocess: Aplicar pré-processamento
             enhance: Melhorar qualidade
             pages: Páginas específicas para PDFs (None = todas)
+            progress_callback: Progresso do OCR de PDFs, com (páginas concluídas, total)
+            total_pages: Número de páginas do PDF, se já conhecido
             
         Returns:
             Dicionário com resultados do scan
@@ -354,26 +526,79 @@ class DocumentScanner:
                 lang=lang, 
                 dpi=dpi,
                 preprocess=preprocess,
-                enhance=enhance
+                enhance=enhance,
+                progress_callback=progress_callback,
+                total_pages=total_pages
             )
         elif file_type == 'image':
-            image = Image.open(file_path)
-            result = self.extract_text_from_image(
-                image, 
-                lang=lang, 
-                preprocess=preprocess, 
-                enhance=enhance
-            )
-            return {
-                'full_text': result.get('text', ''),
-                'confidence': result.get('confidence', 0),
-                'word_count': result.get('word_count', 0),
-                'char_count': result.get('char_count', 0),
-                'pages': {1: result}
-            }
+            return self._scan_image(Image.open(file_path), lang, preprocess, enhance)
         else:
             raise ValueError(f"Tipo de arquivo inválido: {file_type}")
     
+    def scan_document_bytes(
+        self,
+        data: bytes,
+        file_type: str,
+        lang: str = 'por',
+        dpi: int = 300,
+        preprocess: bool = True,
+        enhance: bool = True,
+        pages: Optional[List[int]] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        total_pages: Optional[int] = None
+    ) -> Dict[str, any]:
+        """
+        Escaneia um documento já em memória (por exemplo, um upload)
+        
+        Imagens são abertas direto dos bytes. PDFs são gravados uma única vez em um
+        arquivo temporário: o pdftoppm só lê do disco (o convert_from_bytes também
+        grava um arquivo) e cada página é rasterizada por uma chamada própria.
+        
+        Args:
+            data: Conteúdo do arquivo
+            file_type: Tipo do arquivo ('pdf' ou 'image')
+            Demais argumentos: como em scan_document
+            
+        Returns:
+            Dicionário com resultados do scan
+        """
+        if file_type == 'image':
+            return self._scan_image(Image.open(io.BytesIO(data)), lang, preprocess, enhance)
+        if file_type != 'pdf':
+            raise ValueError(f"Tipo de arquivo inválido: {file_type}")
+        
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
+            tmp_file.write(data)
+        try:
+            return self.extract_text_from_pdf(
+                tmp_file.name,
+                pages=pages,
+                lang=lang,
+                dpi=dpi,
+                preprocess=preprocess,
+                enhance=enhance,
+                progress_callback=progress_callback,
+                total_pages=total_pages
+            )
+        finally:
+            os.unlink(tmp_file.name)
+    
+    def _scan_image(self, image: Image.Image, lang: str, preprocess: bool, enhance: bool) -> Dict[str, any]:
+        """OCR de uma imagem, no formato de resultado de scan_document"""
+        result = self.extract_text_from_image(
+            image, 
+            lang=lang, 
+            preprocess=preprocess, 
+            enhance=enhance
+        )
+        return {
+            'full_text': result.get('text', ''),
+            'confidence': result.get('confidence', 0),
+            'word_count': result.get('word_count', 0),
+            'char_count': result.get('char_count', 0),
+            'pages': {1: result}
+        }
+    
     def batch_scan(
         self,
         file_paths: List[str],
@@ -435,15 +660,17 @@ class DocumentScanner:
             return []
         
         try:
+            if TESSEROCR_AVAILABLE:
+                return tesserocr.get_languages()[1]
             langs = pytesseract.get_languages()
             return langs
         except:
             return ['por', 'eng']  # Idiomas padrão
 
 
-def create_scanner() -> DocumentScanner:
+def create_scanner(ocr_cache: Optional[_OcrResultCache] = None) -> DocumentScanner:
     """Factory function para criar instância do scanner"""
-    return DocumentScanner()
+    return DocumentScanner(ocr_cache=ocr_cache)
 
 
 # ============================================================================
@@ -452,14 +679,22 @@ def create_scanner() -> DocumentScanner:
 
 import streamlit as st
 import zipfile
+import gzip
 import shutil
-import io
+import re
 import subprocess
-from collections import defaultdict
+import math
+import html
+import itertools
+from collections import deque
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from streamlit.runtime.scriptrunner.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
 
 # Imports diretos das bibliotecas
 from pypdf import PdfWriter
-from pdfminer.high_level import extract_text
+from pdfminer.high_level import extract_text_to_fp
+from pdfminer.layout import LAParams
+from xml.sax.saxutils import escape as xml_escape
 
 # pdf2docx é opcional (pode falhar em ambientes headless sem OpenCV)
 try:
@@ -473,8 +708,41 @@ except Exception as e:
     PDF2DocxConverter = None
     PDF2DOCX_AVAILABLE = False
 
+# pypdfium2 é opcional: renderiza páginas em processo, sem chamar o Poppler
+try:
+    import pypdfium2 as pdfium
+    PDFIUM_AVAILABLE = True
+except ImportError:
+    pdfium = None
+    PDFIUM_AVAILABLE = False
+
+# img2pdf é opcional: embute JPEGs no PDF sem decodificar/recodificar
+try:
+    import img2pdf
+    IMG2PDF_AVAILABLE = True
+except ImportError:
+    img2pdf = None
+    IMG2PDF_AVAILABLE = False
+
+# pikepdf é opcional: copia páginas no qpdf (C++), sem reserializar conteúdo inalterado
+try:
+    import pikepdf
+    PIKEPDF_AVAILABLE = True
+except ImportError:
+    pikepdf = None
+    PIKEPDF_AVAILABLE = False
+
+# Sem pikepdf, a CLI do qpdf (se instalada) faz a mesma seleção de páginas fora do Python
+QPDF_PATH = shutil.which("qpdf")
+
+# fcntl só existe em sistemas POSIX; no Windows o lock do LibreOffice fica restrito ao processo
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 # Verificar disponibilidade do scanner (agora no mesmo arquivo)
-SCANNER_AVAILABLE = TESSERACT_AVAILABLE and PDF2IMAGE_AVAILABLE
+SCANNER_AVAILABLE = (TESSERACT_AVAILABLE or TESSEROCR_AVAILABLE) and PDF2IMAGE_AVAILABLE
 
 # Registrar suporte para HEIC/HEIF
 try:
@@ -838,45 +1106,462 @@ st.markdown("""
 
 # Utilitários locais
 
-def _save_writer(writer: PdfWriter, output_path: str) -> None:
-    with open(output_path, "wb") as f:
-        writer.write(f)
+def _writer_bytes(writer: PdfWriter) -> bytes:
+    """Serializa o PDF em memória, pronto para o st.download_button."""
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
 
 
-def _parse_pages(pages: str, max_index: int) -> List[int]:
-    """Converte "1,2,5-8" (1-based) em índices 0-based ordenados e únicos."""
+@st.cache_data(show_spinner=False, max_entries=8)
+def _gzip_text(text: str) -> bytes:
+    """Texto em UTF-8 compactado com gzip, memorizado para não recompactar a cada rerun.
+    mtime=0 deixa a saída determinística.
+    """
+    return gzip.compress(text.encode("utf-8"), compresslevel=6, mtime=0)
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _get_page_count(data: bytes) -> int:
+    """Número de páginas do PDF, memorizado pelo hash dos bytes entre os reruns."""
+    return len(PdfReader(io.BytesIO(data)).pages)
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def _get_reader_entry(data: bytes) -> Tuple[PdfReader, threading.RLock]:
+    reader = PdfReader(io.BytesIO(data))
+    len(reader.pages)
+    return reader, threading.RLock()
+
+
+@contextlib.contextmanager
+def _shared_reader(data: bytes):
+    """PdfReader já analisado para estes bytes, compartilhado entre reruns e sessões.
+    O reader não é thread-safe: fica travado enquanto o bloco roda e não deve ser
+    alterado (girar/comprimir as páginas copiadas no writer, nunca as do reader).
+    Recebe os bytes de UploadedFile.getvalue(), que não copia o upload; abrir o
+    próprio UploadedFile prenderia o reader a um stream com posição compartilhada.
+    """
+    reader, lock = _get_reader_entry(data)
+    with lock:
+        yield reader
+
+
+def _pikepdf_assemble(segments: List[Tuple[bytes, Optional[List[int]]]]) -> bytes:
+    """Monta um PDF com o qpdf a partir de trechos (bytes do PDF, índices 0-based ou None = todas)."""
+    output = io.BytesIO()
+    with contextlib.ExitStack() as stack:
+        out = stack.enter_context(pikepdf.Pdf.new())
+        # Cada PDF de origem é aberto uma vez e precisa ficar aberto até o save
+        sources: Dict[int, "pikepdf.Pdf"] = {}
+        for data, indices in segments:
+            src = sources.get(id(data))
+            if src is None:
+                src = sources[id(data)] = stack.enter_context(pikepdf.open(io.BytesIO(data)))
+            if indices is None:
+                out.pages.extend(src.pages)
+            else:
+                for i in indices:
+                    out.pages.append(src.pages[i])
+        out.save(output)
+    return output.getvalue()
+
+
+def _qpdf_page_range(indices: List[int]) -> str:
+    """Converte índices 0-based na sintaxe de intervalos do qpdf ("1-3,7,10-12")."""
+    runs: List[str] = []
+    start = prev = None
+    for i in indices + [None]:
+        if i is not None and prev is not None and i == prev + 1:
+            prev = i
+            continue
+        if start is not None:
+            runs.append(str(start + 1) if start == prev else f"{start + 1}-{prev + 1}")
+        start = prev = i
+    return ",".join(runs)
+
+
+def _qpdf_assemble(segments: List[Tuple[bytes, Optional[List[int]]]]) -> bytes:
+    """Mesma montagem de _pikepdf_assemble, via `qpdf --empty --pages ... -- saida.pdf`."""
+    with tempfile.TemporaryDirectory() as work_dir:
+        paths: Dict[int, str] = {}
+        pages_args: List[str] = []
+        for data, indices in segments:
+            if indices is not None and not indices:
+                continue
+            path = paths.get(id(data))
+            if path is None:
+                path = paths[id(data)] = _stage_input(data, work_dir, f"entrada_{len(paths)}.pdf")
+            pages_args.append(path)
+            if indices is not None:
+                pages_args.append(_qpdf_page_range(indices))
+        output_path = os.path.join(work_dir, "saida.pdf")
+        subprocess.run(
+            [QPDF_PATH, "--empty", "--pages", *pages_args, "--", output_path],
+            check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        return Path(output_path).read_bytes()
+
+
+def _qpdf_split(data: bytes, first: int, last: int) -> List[bytes]:
+    """Divide as páginas first..last (0-based) em PDFs de uma página com um único `qpdf --split-pages`."""
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_path = _stage_input(data, work_dir)
+        subprocess.run(
+            [QPDF_PATH, "--empty", "--pages", input_path, f"{first + 1}-{last + 1}", "--",
+             "--split-pages", os.path.join(work_dir, "pagina-%d.pdf")],
+            check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        # O qpdf completa os números com zeros, então a ordem alfabética é a ordem das páginas
+        outputs = sorted(Path(work_dir).glob("pagina-*.pdf"))
+        return [path.read_bytes() for path in outputs]
+
+
+def _assemble_pages(segments: List[Tuple[bytes, Optional[List[int]]]]) -> bytes:
+    """Seleciona páginas pelo qpdf: pikepdf em processo ou, sem ele, a CLI."""
+    if PIKEPDF_AVAILABLE:
+        return _pikepdf_assemble(segments)
+    return _qpdf_assemble(segments)
+
+
+_PAGE_RANGE_RE = re.compile(r"^\s*(\d+)\s*(?:-\s*(\d+)\s*)?$")
+
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def _expand_pages(pages: str, max_index: int) -> Tuple[int, ...]:
+    """Converte "1,2,5-8" (1-based) em índices 0-based ordenados e únicos.
+    Memorizado entre os reruns; a tupla é imutável, então o cache pode devolvê-la sem cópia.
+    """
     indices: List[int] = []
     if not pages:
-        return indices
-    parts = [p.strip() for p in pages.split(",") if p.strip()]
-    for part in parts:
-        if "-" in part:
-            start_s, end_s = part.split("-", 1)
-            start = int(start_s)
-            end = int(end_s)
+        return ()
+    for part in pages.split(","):
+        if not part.strip():
+            continue
+        match = _PAGE_RANGE_RE.match(part)
+        if not match:
+            raise ValueError(f"Intervalo de páginas inválido: {part.strip()}")
+        start = int(match.group(1))
+        if match.group(2) is not None:
+            end = int(match.group(2))
             if start < 1 or end < start or end > max_index:
                 raise ValueError("Intervalo de páginas inválido.")
-            indices.extend(list(range(start - 1, end)))
+            indices.extend(range(start - 1, end))
         else:
-            idx = int(part)
-            if idx < 1 or idx > max_index:
+            if start < 1 or start > max_index:
                 raise ValueError("Número de página fora do intervalo.")
-            indices.append(idx - 1)
+            indices.append(start - 1)
     # Remover duplicatas mantendo ordem
-    seen = set()
-    ordered: List[int] = []
-    for i in indices:
-        if i not in seen:
-            seen.add(i)
-            ordered.append(i)
-    return ordered
+    return tuple(dict.fromkeys(indices))
 
 
-def _libreoffice_convert(input_path: str, output_dir: str, target_filter: str) -> str:
-    """Converte via LibreOffice headless. Retorna caminho convertido.
-    Observação: no Streamlit Cloud, LibreOffice pode não estar disponível.
+def _parse_pages(pages: str, max_index: int) -> List[int]:
+    """Índices de _expand_pages como lista: o pypdf lê uma tupla em append(pages=...) como
+    (início, fim, passo) e o numpy como índice multidimensional.
     """
-    os.makedirs(output_dir, exist_ok=True)
+    return list(_expand_pages(pages, max_index))
+
+
+def _page_mask(pages: str, max_index: int) -> np.ndarray:
+    """Máscara booleana (uma posição por página) com as páginas de "1,2,5-8" marcadas."""
+    mask = np.zeros(max_index, dtype=bool)
+    mask[_parse_pages(pages, max_index)] = True
+    return mask
+
+
+def _page_ranges(pages: List[int], chunk_size: int) -> List[Tuple[int, int]]:
+    """Agrupa índices 0-based em intervalos contíguos (inclusivos) de até chunk_size páginas."""
+    ranges: List[Tuple[int, int]] = []
+    for idx in pages:
+        if ranges and idx == ranges[-1][1] + 1 and ranges[-1][1] - ranges[-1][0] + 1 < chunk_size:
+            ranges[-1] = (ranges[-1][0], idx)
+        else:
+            ranges.append((idx, idx))
+    return ranges
+
+
+def _render_pages_pdfium(
+    pdf,
+    pages: List[int],
+    dpi: int,
+    fmt: str,
+    jpegopt: Optional[Dict] = None
+) -> Dict[int, bytes]:
+    """Renderiza e codifica as páginas em memória. Retorna {índice 0-based: bytes da imagem}.
+    O PDFium não é thread-safe: o chamador segura o lock e as páginas saem em sequência.
+    """
+    rendered: Dict[int, bytes] = {}
+    for idx in pages:
+        img = pdf[idx].render(scale=dpi / 72).to_pil()
+        buffer = io.BytesIO()
+        if fmt == "jpeg":
+            img.convert("RGB").save(buffer, "JPEG", **(jpegopt or {}))
+        else:
+            img.save(buffer, "PNG", optimize=False)
+        rendered[idx] = buffer.getvalue()
+    return rendered
+
+
+def _render_pages_pdftoppm(
+    pdf_path: str,
+    pages: List[int],
+    dpi: int,
+    output_dir: str,
+    fmt: str,
+    workers: int,
+    jpegopt: Optional[Dict] = None
+) -> Dict[int, bytes]:
+    """Rasteriza com vários pdftoppm em paralelo, em output_dir. Retorna {índice 0-based: bytes da imagem}."""
+    workers = max(1, min(workers, len(pages)))
+    ranges = _page_ranges(pages, math.ceil(len(pages) / workers))
+
+    def render(page_range: Tuple[int, int]) -> List[Tuple[int, bytes]]:
+        first, last = page_range
+        paths = convert_from_path(
+            pdf_path,
+            dpi=dpi,
+            first_page=first + 1,
+            last_page=last + 1,
+            output_folder=output_dir,
+            output_file=f"p{first:05d}_",
+            fmt=fmt,
+            jpegopt=jpegopt,
+            paths_only=True
+        )
+        return [(idx, Path(path).read_bytes()) for idx, path in zip(range(first, last + 1), paths)]
+
+    rendered: Dict[int, bytes] = {}
+    # Cada tarefa só aguarda o próprio pdftoppm, então threads bastam para paralelizar
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for pairs in executor.map(render, ranges):
+            rendered.update(pairs)
+    return rendered
+
+
+class _PageRenderCache:
+    """Cache LRU em memória de páginas já rasterizadas, limitado pelo tamanho total.
+    Chave: (hash do PDF, formato, dpi, qualidade, índice da página); valor: bytes da imagem.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.entries: "OrderedDict[tuple, bytes]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[bytes]:
+        """Retorna a página em cache, ou None se não estiver no cache."""
+        with self.lock:
+            data = self.entries.get(key)
+            if data is not None:
+                self.entries.move_to_end(key)
+            return data
+
+    def put(self, key: tuple, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                return
+            self.entries[key] = data
+            self.total_bytes += len(data)
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.total_bytes -= len(evicted)
+
+
+@st.cache_resource
+def _get_page_cache() -> _PageRenderCache:
+    # cache_resource mantém a mesma instância entre reruns e sessões
+    return _PageRenderCache()
+
+
+@st.cache_resource
+def _get_ocr_cache() -> _OcrResultCache:
+    # Compartilhado entre reruns e sessões: reescanear o mesmo documento não refaz o OCR
+    return _OcrResultCache()
+
+
+@st.cache_resource
+def _get_scanner() -> DocumentScanner:
+    # Um scanner para todo o app: as instâncias do tesserocr (por idioma) sobrevivem aos reruns
+    return create_scanner(ocr_cache=_get_ocr_cache())
+
+
+def _render_pages_cached(
+    cache: _PageRenderCache,
+    pdf_hash: str,
+    pages: List[int],
+    dpi: int,
+    fmt: str,
+    jpegopt: Optional[Dict],
+    render_fn
+) -> Dict[int, bytes]:
+    """Devolve {índice 0-based: bytes da imagem}, reaproveitando do cache as páginas já
+    renderizadas com os mesmos parâmetros; as demais são passadas a render_fn.
+    """
+    quality = (jpegopt or {}).get("quality")
+    rendered: Dict[int, bytes] = {}
+    missing: List[int] = []
+    for idx in pages:
+        data = cache.get((pdf_hash, fmt, dpi, quality, idx))
+        if data is not None:
+            rendered[idx] = data
+        else:
+            missing.append(idx)
+    if missing:
+        new_pages = render_fn(missing)
+        for idx, data in new_pages.items():
+            cache.put((pdf_hash, fmt, dpi, quality, idx), data)
+        rendered.update(new_pages)
+    return rendered
+
+
+class _EscapingWriter(io.TextIOBase):
+    """Repassa o texto recebido a outro arquivo, escapado por escape_fn."""
+
+    def __init__(self, target, escape_fn):
+        self.target = target
+        self.escape_fn = escape_fn
+
+    def write(self, text: str) -> int:
+        self.target.write(self.escape_fn(text))
+        return len(text)
+
+
+def _extract_text_pdfium(pdf_bytes: bytes, out_fp) -> None:
+    """Extração rápida: texto de cada página direto do PDFium (código nativo, sem análise de layout)."""
+    with _get_pdfium_lock():
+        pdf = pdfium.PdfDocument(pdf_bytes)
+        try:
+            for page in pdf:
+                textpage = page.get_textpage()
+                # O PDFium separa as linhas com \r\n
+                out_fp.write(textpage.get_text_range().replace("\r\n", "\n") + "\n")
+                textpage.close()
+                page.close()
+        finally:
+            pdf.close()
+
+
+def _extract_text_bytes(
+    pdf_bytes: bytes,
+    header: str = "",
+    footer: str = "",
+    escape_fn=None,
+    high_fidelity: bool = True
+) -> bytes:
+    """Extrai o texto do PDF página a página para um buffer UTF-8, entre header e footer.
+    Com escape_fn, o texto extraído (e só ele) é escapado antes de ser escrito.
+    high_fidelity usa a análise de layout do pdfminer (melhor ordem de leitura, bem mais
+    lenta); sem ela, o texto vem do PDFium quando disponível.
+    """
+    output = io.BytesIO()
+    out_fp = io.TextIOWrapper(output, encoding="utf-8")
+    out_fp.write(header)
+    target = _EscapingWriter(out_fp, escape_fn) if escape_fn else out_fp
+    if high_fidelity or not PDFIUM_AVAILABLE:
+        extract_text_to_fp(io.BytesIO(pdf_bytes), target, laparams=LAParams(), output_type="text", codec="utf-8")
+    else:
+        _extract_text_pdfium(pdf_bytes, target)
+    out_fp.write(footer)
+    out_fp.flush()
+    return output.getvalue()
+
+
+# Página A4 em polegadas (lado menor, lado maior)
+A4_INCHES = (8.27, 11.69)
+
+
+def _shrink_to_page(img: Image.Image, target_dpi: int) -> bool:
+    """Reduz img (in place) para caber numa página A4 a target_dpi, na orientação da imagem.
+    Em JPEGs, thumbnail() aciona o draft() do decodificador: o libjpeg já decodifica em
+    1/2, 1/4 ou 1/8 da escala, sem montar o bitmap inteiro. Retorna True se reduziu.
+    """
+    short_side, long_side = (round(target_dpi * inches) for inches in A4_INCHES)
+    max_size = (long_side, short_side) if img.width > img.height else (short_side, long_side)
+    if img.width <= max_size[0] and img.height <= max_size[1]:
+        return False
+    img.thumbnail(max_size)
+    return True
+
+
+# Resolução usada pelo Pillow ao salvar em PDF (1 pixel = 1 ponto); o img2pdf assumiria 96
+PDF_DEFAULT_DPI = 72
+
+
+def _image_bytes_for_pdf(data: bytes, target_dpi: Optional[int] = None) -> Tuple[bytes, int]:
+    """Prepara uma imagem para o img2pdf: JPEGs passam intactos; os demais formatos
+    (PNG, HEIC...) são recodificados como JPEG, como o Pillow já fazia ao salvar em PDF.
+    Com target_dpi, imagens maiores que uma página A4 nessa resolução são reduzidas.
+    Retorna (bytes, dpi da página): target_dpi se reduziu, senão PDF_DEFAULT_DPI.
+    """
+    img = Image.open(io.BytesIO(data))
+    resized = target_dpi is not None and _shrink_to_page(img, target_dpi)
+    page_dpi = target_dpi if resized else PDF_DEFAULT_DPI
+    if img.format == "JPEG" and not resized:
+        return data, page_dpi
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    buffer = io.BytesIO()
+    img.save(buffer, "JPEG", dpi=(page_dpi, page_dpi))
+    return buffer.getvalue(), page_dpi
+
+
+def _page_dpi_layout(page_dpis: List[int]):
+    """layout_fun do img2pdf que ignora o DPI gravado em cada imagem (ou os 96 assumidos
+    quando não há) e usa page_dpis, na ordem. O img2pdf chama a função uma vez por quadro,
+    e as imagens de _image_bytes_for_pdf têm sempre um quadro só.
+    """
+    remaining = iter(page_dpis)
+
+    def layout_fun(imgwidthpx, imgheightpx, ndpi):
+        dpi = next(remaining)
+        return img2pdf.default_layout_fun(imgwidthpx, imgheightpx, (dpi, dpi))
+
+    return layout_fun
+
+
+# LibreOffice: lotes maiores não aceleram e aumentam o prejuízo em caso de timeout
+SOFFICE_MAX_BATCH = 10
+SOFFICE_TIMEOUT_PER_FILE = 120  # segundos
+SOFFICE_LOCK_PATH = os.path.join(tempfile.gettempdir(), "pdfapp_soffice.lock")
+
+
+def _libreoffice_output_path(input_path: str, output_dir: str, target_filter: str) -> str:
+    """Retorna o caminho que o LibreOffice usa para o arquivo convertido."""
+    base_name = os.path.splitext(os.path.basename(input_path))[0]
+    target = target_filter.lower()
+    for ext in ("pdf", "docx", "pptx", "xlsx", "rtf"):
+        if target.startswith(ext):
+            return os.path.join(output_dir, f"{base_name}.{ext}")
+    raise RuntimeError("Formato alvo não suportado pelo conversor.")
+
+
+@st.cache_resource
+def _get_soffice_thread_lock() -> threading.Lock:
+    return threading.Lock()
+
+
+@contextlib.contextmanager
+def _soffice_lock():
+    """Serializa as chamadas ao LibreOffice entre sessões e processos: instâncias simultâneas
+    com o mesmo perfil de usuário podem travar ou corromper a saída.
+    """
+    if fcntl is None:
+        with _get_soffice_thread_lock():
+            yield
+        return
+    fd = os.open(SOFFICE_LOCK_PATH, os.O_CREAT | os.O_RDWR)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        # Fechar o descritor libera o flock
+        os.close(fd)
+
+
+def _run_soffice(input_paths: List[str], output_dir: str, target_filter: str, timeout: float) -> None:
     cmd = [
         "soffice",
         "--headless",
@@ -884,32 +1569,135 @@ def _libreoffice_convert(input_path: str, output_dir: str, target_filter: str) -
         target_filter,
         "--outdir",
         output_dir,
-        input_path,
+        *input_paths,
     ]
-    try:
-        subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    except Exception:
-        # Tentativa em Windows/nome alternativo
-        cmd[0] = "soffice.exe"
-        subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    with _soffice_lock():
+        try:
+            subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout)
+        except FileNotFoundError:
+            # Tentativa em Windows/nome alternativo
+            cmd[0] = "soffice.exe"
+            subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout)
+
+
+def _libreoffice_convert_batch(
+    input_paths: List[str],
+    output_dir: str,
+    target_filter: str,
+    timeout_per_file: float = SOFFICE_TIMEOUT_PER_FILE
+) -> List[str]:
+    """Converte vários arquivos com uma única chamada ao LibreOffice por lote.
+    Os arquivos são enviados em lotes de até SOFFICE_MAX_BATCH; um lote que falha
+    é dividido ao meio e reprocessado. Retorna os caminhos convertidos na ordem de entrada.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    def convert_chunk(paths: List[str]) -> None:
+        try:
+            _run_soffice(paths, output_dir, target_filter, timeout_per_file * len(paths))
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
+            if len(paths) == 1:
+                raise
+            middle = len(paths) // 2
+            convert_chunk(paths[:middle])
+            convert_chunk(paths[middle:])
+
+    for start in range(0, len(input_paths), SOFFICE_MAX_BATCH):
+        convert_chunk(input_paths[start:start + SOFFICE_MAX_BATCH])
+
+    converted_paths = [_libreoffice_output_path(path, output_dir, target_filter) for path in input_paths]
+    for converted in converted_paths:
+        if not os.path.exists(converted):
+            raise RuntimeError("Falha na conversão via LibreOffice: arquivo convertido não encontrado.")
+    return converted_paths
+
+
+def _libreoffice_convert(input_path: str, output_dir: str, target_filter: str) -> str:
+    """Converte via LibreOffice headless. Retorna caminho convertido.
+    Observação: no Streamlit Cloud, LibreOffice pode não estar disponível.
+    """
+    return _libreoffice_convert_batch([input_path], output_dir, target_filter)[0]
+
+
+def _stage_input(data: bytes, work_dir: str, name: str = "entrada.pdf") -> str:
+    """Grava data em work_dir para as ferramentas que só aceitam um caminho (soffice,
+    pdftoppm, pdf2docx). Retorna o caminho gravado.
+    Recebe os bytes de UploadedFile.getvalue(), que não copia o upload; getbuffer()
+    copiaria, pois exportar o buffer obriga o BytesIO a deixar de compartilhá-lo.
+    """
+    input_path = os.path.join(work_dir, name)
+    with open(input_path, "wb") as input_file:
+        input_file.write(data)
+    return input_path
+
+
+def _run_conv(fn) -> bytes:
+    """Chama fn(work_dir) num diretório temporário e devolve os bytes do arquivo cujo
+    caminho fn retorna. O diretório é removido na saída, inclusive em caso de erro.
+    """
+    with tempfile.TemporaryDirectory() as work_dir:
+        return Path(fn(work_dir)).read_bytes()
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _libreoffice_convert_bytes(data: bytes, input_name: str, target_filter: str) -> bytes:
+    """Como _libreoffice_convert, mas recebe e devolve bytes."""
+    return _run_conv(
+        lambda work_dir: _libreoffice_convert(_stage_input(data, work_dir, input_name), work_dir, target_filter)
+    )
+
+
+@st.cache_resource
+def _get_executor() -> ThreadPoolExecutor:
+    """Executor compartilhado pelas conversões em segundo plano, entre reruns e sessões.
+    Threads, e não processos: as funções deste script (o __main__ do Streamlit) não podem
+    ser enviadas a processos filhos, e o trabalho pesado (soffice, pdftoppm, PDFium)
+    roda fora do GIL.
+    """
+    return ThreadPoolExecutor(max_workers=max(1, (os.cpu_count() or 2) // 2), thread_name_prefix="conversao")
+
+
+@st.cache_resource
+def _get_pdfium_lock() -> threading.Lock:
+    # O PDFium não é thread-safe: um lock global serializa o uso entre conversões
+    return threading.Lock()
 
-    base_name = os.path.splitext(os.path.basename(input_path))[0]
-    target = target_filter.lower()
-    if target.startswith("pdf"):
-        converted = os.path.join(output_dir, f"{base_name}.pdf")
-    elif target.startswith("docx"):
-        converted = os.path.join(output_dir, f"{base_name}.docx")
-    elif target.startswith("pptx"):
-        converted = os.path.join(output_dir, f"{base_name}.pptx")
-    elif target.startswith("xlsx"):
-        converted = os.path.join(output_dir, f"{base_name}.xlsx")
-    elif target.startswith("rtf"):
-        converted = os.path.join(output_dir, f"{base_name}.rtf")
-    else:
-        raise RuntimeError("Formato alvo não suportado pelo conversor.")
-    if not os.path.exists(converted):
-        raise RuntimeError("Falha na conversão via LibreOffice: arquivo convertido não encontrado.")
-    return converted
+
+def _run_in_background(label: str, fn, *args):
+    """Executa fn(*args) no executor compartilhado, acompanhando com st.status até terminar.
+    Retorna o resultado de fn; exceções da tarefa são relançadas aqui.
+    """
+    ctx = get_script_run_ctx()
+    
+    def task():
+        # Os núcleos usam st.cache_data: a thread do executor recebe o contexto desta sessão
+        thread = threading.current_thread()
+        previous = get_script_run_ctx(suppress_warning=True)
+        add_script_run_ctx(thread, ctx)
+        try:
+            return fn(*args)
+        finally:
+            # A thread volta ao pool: a próxima tarefa (talvez de outra sessão) não pode
+            # herdar este contexto. add_script_run_ctx não aceita None, daí o atributo direto
+            if previous is None:
+                thread.__dict__.pop(SCRIPT_RUN_CONTEXT_ATTR_NAME, None)
+            else:
+                setattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, previous)
+    
+    future = _get_executor().submit(task)
+    started = time.monotonic()
+    elapsed = 0
+    with st.status(label) as status:
+        while not future.done():
+            time.sleep(0.2)
+            if int(time.monotonic() - started) != elapsed:
+                elapsed = int(time.monotonic() - started)
+                status.update(label=f"{label} ({elapsed}s)")
+        if future.exception() is not None:
+            status.update(label="Falha na conversão", state="error")
+        else:
+            status.update(label=f"Concluído em {time.monotonic() - started:.1f}s", state="complete")
+    return future.result()
 
 
 def main():
@@ -992,6 +1780,19 @@ def show_convert_pdf_to_other_formats():
         elif conversion_type == "PDF para Páginas Web":
             convert_pdf_to_html(uploaded_file)
 
+@st.cache_data(show_spinner=False, max_entries=32)
+def _convert_pdf_to_word_impl(pdf_bytes: bytes) -> bytes:
+    """Núcleo da conversão PDF → DOCX: recebe e devolve bytes."""
+    def convert(work_dir: str) -> str:
+        tmp_path = _stage_input(pdf_bytes, work_dir)
+        output_path = os.path.join(work_dir, "documento.docx")
+        conv = PDF2DocxConverter(tmp_path)
+        conv.convert(output_path)
+        conv.close()
+        return output_path
+    
+    return _run_conv(convert)
+
 def convert_pdf_to_word(uploaded_file):
     """Converte PDF para Word (DOCX)"""
     if not PDF2DOCX_AVAILABLE:
@@ -1007,329 +1808,258 @@ def convert_pdf_to_word(uploaded_file):
         return
     
     if st.button("🚀 Converter para Word", type="primary"):
-        with st.spinner("Convertendo PDF para Word..."):
-            try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                    tmp_file.write(uploaded_file.getvalue())
-                    tmp_path = tmp_file.name
-                
-                output_name = "documento.docx"
-                conv = PDF2DocxConverter(tmp_path)
-                conv.convert(output_name)
-                conv.close()
-                
-                os.unlink(tmp_path)
-                
-                with open(output_name, "rb") as file:
-                    st.download_button(
-                        label="📥 Baixar documento.docx",
-                        data=file.read(),
-                        file_name=output_name,
-                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                    )
-                st.success("✅ Conversão concluída!")
-            except Exception as e:
-                st.error(f"❌ Erro: {str(e)}")
-                import traceback
-                with st.expander("🔍 Detalhes do erro"):
-                    st.code(traceback.format_exc())
-            finally:
-                if os.path.exists(output_name):
-                    os.remove(output_name)
+        try:
+            data = _run_in_background(
+                "Convertendo PDF para Word...", _convert_pdf_to_word_impl, uploaded_file.getvalue()
+            )
+            st.download_button(
+                label="📥 Baixar documento.docx",
+                data=data,
+                file_name="documento.docx",
+                mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+            )
+            st.success("✅ Conversão concluída!")
+        except Exception as e:
+            st.error(f"❌ Erro: {str(e)}")
+            import traceback
+            with st.expander("🔍 Detalhes do erro"):
+                st.code(traceback.format_exc())
 
 def convert_pdf_to_excel(uploaded_file):
     """Converte PDF para Excel (XLSX)"""
     if st.button("🚀 Converter para Excel", type="primary"):
-        with st.spinner("Convertendo PDF para Excel..."):
-            try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                    tmp_file.write(uploaded_file.getvalue())
-                    tmp_path = tmp_file.name
-                
-                output_name = "planilha.xlsx"
-                temp_dir = tempfile.mkdtemp()
-                converted_path = _libreoffice_convert(tmp_path, temp_dir, "xlsx")
-                os.rename(converted_path, output_name)
-                
-                os.unlink(tmp_path)
-                shutil.rmtree(temp_dir)
-                
-                with open(output_name, "rb") as file:
-                    st.download_button(
-                        label="📥 Baixar planilha.xlsx",
-                        data=file.read(),
-                        file_name=output_name,
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                    )
-                st.success("✅ Conversão concluída!")
-            except Exception as e:
-                st.error(f"❌ Erro: {str(e)}")
-            finally:
-                if os.path.exists(output_name):
-                    os.remove(output_name)
+        try:
+            data = _run_in_background(
+                "Convertendo PDF para Excel...", _libreoffice_convert_bytes, uploaded_file.getvalue(), "entrada.pdf", "xlsx"
+            )
+            st.download_button(
+                label="📥 Baixar planilha.xlsx",
+                data=data,
+                file_name="planilha.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            )
+            st.success("✅ Conversão concluída!")
+        except Exception as e:
+            st.error(f"❌ Erro: {str(e)}")
 
 def convert_pdf_to_ppt(uploaded_file):
     """Converte PDF para PowerPoint (PPTX)"""
     if st.button("🚀 Converter para PPT", type="primary"):
-        with st.spinner("Convertendo PDF para PowerPoint..."):
+        try:
+            data = _run_in_background(
+                "Convertendo PDF para PowerPoint...", _libreoffice_convert_bytes, uploaded_file.getvalue(), "entrada.pdf", "pptx"
+            )
+            st.download_button(
+                label="📥 Baixar apresentacao.pptx",
+                data=data,
+                file_name="apresentacao.pptx",
+                mime="application/vnd.openxmlformats-officedocument.presentationml.presentation"
+            )
+            st.success("✅ Conversão concluída!")
+        except Exception as e:
+            st.error(f"❌ Erro: {str(e)}")
+
+def _convert_pdf_to_images_impl(
+    pdf_bytes: bytes,
+    pages_input: str,
+    dpi: int,
+    fmt: str,
+    workers: int,
+    jpegopt: Optional[Dict],
+    _cache: _PageRenderCache
+) -> Tuple[bytes, int]:
+    """Núcleo da conversão PDF → PNG/JPEG. Retorna (ZIP com as imagens, número de páginas).
+    Sem st.cache_data: as páginas já ficam no _cache, limitado em bytes, e o ZIP (sem
+    compressão) é só uma cópia delas; guardá-lo também furaria esse limite.
+    """
+    pdf_hash = hashlib.blake2b(pdf_bytes).hexdigest()
+    if PDFIUM_AVAILABLE:
+        # Renderização e codificação em memória, sem arquivos temporários. O PDFium
+        # não é thread-safe: conversões simultâneas usam-no uma de cada vez
+        with _get_pdfium_lock():
+            document = pdfium.PdfDocument(pdf_bytes)
             try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                    tmp_file.write(uploaded_file.getvalue())
-                    tmp_path = tmp_file.name
-                
-                output_name = "apresentacao.pptx"
-                temp_dir = tempfile.mkdtemp()
-                converted_path = _libreoffice_convert(tmp_path, temp_dir, "pptx")
-                os.rename(converted_path, output_name)
-                
-                os.unlink(tmp_path)
-                shutil.rmtree(temp_dir)
-                
-                with open(output_name, "rb") as file:
-                    st.download_button(
-                        label="📥 Baixar apresentacao.pptx",
-                        data=file.read(),
-                        file_name=output_name,
-                        mime="application/vnd.openxmlformats-officedocument.presentationml.presentation"
-                    )
-                st.success("✅ Conversão concluída!")
-            except Exception as e:
-                st.error(f"❌ Erro: {str(e)}")
+                total_pages = len(document)
+                pages = _parse_pages(pages_input, total_pages) if pages_input else list(range(total_pages))
+                rendered = _render_pages_cached(
+                    _cache, pdf_hash, pages, dpi, fmt, jpegopt,
+                    lambda missing: _render_pages_pdfium(document, missing, dpi, fmt, jpegopt)
+                )
             finally:
-                if os.path.exists(output_name):
-                    os.remove(output_name)
+                document.close()
+    else:
+        with tempfile.TemporaryDirectory() as work_dir:
+            tmp_path = _stage_input(pdf_bytes, work_dir)
+            total_pages = _get_page_count(pdf_bytes)
+            pages = _parse_pages(pages_input, total_pages) if pages_input else list(range(total_pages))
+            rendered = _render_pages_cached(
+                _cache, pdf_hash, pages, dpi, fmt, jpegopt,
+                lambda missing: _render_pages_pdftoppm(tmp_path, missing, dpi, work_dir, fmt, workers, jpegopt)
+            )
+    
+    # PNG/JPEG já são comprimidos: ZIP_STORED evita uma passada inútil de deflate
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, 'w', compression=zipfile.ZIP_STORED) as zip_file:
+        for idx in pages:
+            zip_file.writestr(f"pagina_{idx+1}.{fmt}", rendered[idx])
+    return zip_buffer.getvalue(), len(pages)
 
 def convert_pdf_to_png(uploaded_file):
     """Converte PDF para PNG"""
     dpi = st.slider("DPI:", 100, 300, 200)
     pages_input = st.text_input("Páginas (vazio = todas):", placeholder="1,3,5 ou deixe vazio")
+    workers = os.cpu_count() or 1
+    if not PDFIUM_AVAILABLE:
+        workers = st.slider("Processos paralelos:", 1, workers, workers)
     
     if st.button("🚀 Converter para PNG", type="primary"):
-        with st.spinner("Convertendo PDF para PNG..."):
-            try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                    tmp_file.write(uploaded_file.getvalue())
-                    tmp_path = tmp_file.name
-                
-                temp_dir = tempfile.mkdtemp()
-                reader = PdfReader(tmp_path)
-                pages = _parse_pages(pages_input, len(reader.pages)) if pages_input else list(range(len(reader.pages)))
-                
-                for idx in pages:
-                    imgs = convert_from_path(tmp_path, dpi=dpi, first_page=idx + 1, last_page=idx + 1)
-                    img = imgs[0]
-                    output_path = os.path.join(temp_dir, f"pagina_{idx+1}.png")
-                    img.save(output_path)
-                
-                zip_path = "imagens_png.zip"
-                with zipfile.ZipFile(zip_path, 'w') as zip_file:
-                    for file_name in os.listdir(temp_dir):
-                        zip_file.write(os.path.join(temp_dir, file_name), file_name)
-                
-                os.unlink(tmp_path)
-                shutil.rmtree(temp_dir)
-                
-                with open(zip_path, "rb") as file:
-                    st.download_button(
-                        label=f"📥 Baixar ZIP com {len(pages)} imagens PNG",
-                        data=file.read(),
-                        file_name=zip_path,
-                        mime="application/zip"
-                    )
-                st.success(f"✅ {len(pages)} imagens PNG geradas!")
-            except Exception as e:
-                st.error(f"❌ Erro: {str(e)}")
-            finally:
-                if os.path.exists(zip_path):
-                    os.remove(zip_path)
+        try:
+            data, page_count = _run_in_background(
+                "Convertendo PDF para PNG...", _convert_pdf_to_images_impl,
+                uploaded_file.getvalue(), pages_input, dpi, "png", workers, None,
+                _get_page_cache()
+            )
+            st.download_button(
+                label=f"📥 Baixar ZIP com {page_count} imagens PNG",
+                data=data,
+                file_name="imagens_png.zip",
+                mime="application/zip"
+            )
+            st.success(f"✅ {page_count} imagens PNG geradas!")
+        except Exception as e:
+            st.error(f"❌ Erro: {str(e)}")
 
 def convert_pdf_to_jpeg(uploaded_file):
     """Converte PDF para JPEG"""
     dpi = st.slider("DPI:", 100, 300, 200)
     quality = st.slider("Qualidade JPEG:", 50, 100, 95)
     pages_input = st.text_input("Páginas (vazio = todas):", placeholder="1,3,5 ou deixe vazio")
+    workers = os.cpu_count() or 1
+    if not PDFIUM_AVAILABLE:
+        workers = st.slider("Processos paralelos:", 1, workers, workers)
     
     if st.button("🚀 Converter para JPEG", type="primary"):
-        with st.spinner("Convertendo PDF para JPEG..."):
-            try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                    tmp_file.write(uploaded_file.getvalue())
-                    tmp_path = tmp_file.name
-                
-                temp_dir = tempfile.mkdtemp()
-                reader = PdfReader(tmp_path)
-                pages = _parse_pages(pages_input, len(reader.pages)) if pages_input else list(range(len(reader.pages)))
-                
-                for idx in pages:
-                    imgs = convert_from_path(tmp_path, dpi=dpi, first_page=idx + 1, last_page=idx + 1)
-                    img = imgs[0].convert("RGB")
-                    output_path = os.path.join(temp_dir, f"pagina_{idx+1}.jpeg")
-                    img.save(output_path, "JPEG", quality=quality)
-                
-                zip_path = "imagens_jpeg.zip"
-                with zipfile.ZipFile(zip_path, 'w') as zip_file:
-                    for file_name in os.listdir(temp_dir):
-                        zip_file.write(os.path.join(temp_dir, file_name), file_name)
-                
-                os.unlink(tmp_path)
-                shutil.rmtree(temp_dir)
-                
-                with open(zip_path, "rb") as file:
-                    st.download_button(
-                        label=f"📥 Baixar ZIP com {len(pages)} imagens JPEG",
-                        data=file.read(),
-                        file_name=zip_path,
-                        mime="application/zip"
-                    )
-                st.success(f"✅ {len(pages)} imagens JPEG geradas!")
-            except Exception as e:
-                st.error(f"❌ Erro: {str(e)}")
-            finally:
-                if os.path.exists(zip_path):
-                    os.remove(zip_path)
+        try:
+            data, page_count = _run_in_background(
+                "Convertendo PDF para JPEG...", _convert_pdf_to_images_impl,
+                uploaded_file.getvalue(), pages_input, dpi, "jpeg", workers, {"quality": quality},
+                _get_page_cache()
+            )
+            st.download_button(
+                label=f"📥 Baixar ZIP com {page_count} imagens JPEG",
+                data=data,
+                file_name="imagens_jpeg.zip",
+                mime="application/zip"
+            )
+            st.success(f"✅ {page_count} imagens JPEG geradas!")
+        except Exception as e:
+            st.error(f"❌ Erro: {str(e)}")
+
+def _high_fidelity_checkbox() -> bool:
+    """Opção de extração com análise de layout (pdfminer); sem o PDFium, é sempre usada."""
+    if not PDFIUM_AVAILABLE:
+        return True
+    return st.checkbox(
+        "Layout de alta fidelidade (mais lento)",
+        help="Usa a análise de layout do pdfminer, que preserva melhor a ordem de leitura em colunas e tabelas"
+    )
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _convert_pdf_to_xml_impl(pdf_bytes: bytes, high_fidelity: bool) -> bytes:
+    """Núcleo da conversão PDF → XML: o texto extraído vai escapado dentro de <conteudo>."""
+    return _extract_text_bytes(
+        pdf_bytes,
+        header='<?xml version="1.0" encoding="UTF-8"?>\n<documento>\n  <conteudo>',
+        footer="</conteudo>\n</documento>",
+        escape_fn=xml_escape,
+        high_fidelity=high_fidelity
+    )
 
 def convert_pdf_to_xml(uploaded_file):
     """Converte PDF para XML"""
+    high_fidelity = _high_fidelity_checkbox()
+    
     if st.button("🚀 Converter para XML", type="primary"):
-        with st.spinner("Convertendo PDF para XML..."):
-            try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                    tmp_file.write(uploaded_file.getvalue())
-                    tmp_path = tmp_file.name
-                
-                texto = extract_text(tmp_path) or ""
-                content = f"""<?xml version="1.0" encoding="UTF-8"?>
-<documento>
-  <conteudo>{texto.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")}</conteudo>
-</documento>"""
-                output_name = "documento.xml"
-                
-                with open(output_name, "w", encoding="utf-8") as f:
-                    f.write(content)
-                
-                os.unlink(tmp_path)
-                
-                with open(output_name, "rb") as file:
-                    st.download_button(
-                        label="📥 Baixar documento.xml",
-                        data=file.read(),
-                        file_name=output_name,
-                        mime="application/xml"
-                    )
-                st.success("✅ Conversão concluída!")
-            except Exception as e:
-                st.error(f"❌ Erro: {str(e)}")
-            finally:
-                if os.path.exists(output_name):
-                    os.remove(output_name)
+        try:
+            data = _run_in_background(
+                "Convertendo PDF para XML...", _convert_pdf_to_xml_impl, uploaded_file.getvalue(), high_fidelity
+            )
+            st.download_button(label="📥 Baixar documento.xml", data=data, file_name="documento.xml", mime="application/xml")
+            st.success("✅ Conversão concluída!")
+        except Exception as e:
+            st.error(f"❌ Erro: {str(e)}")
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _convert_pdf_to_txt_impl(pdf_bytes: bytes, high_fidelity: bool) -> bytes:
+    """Núcleo da conversão PDF → TXT."""
+    return _extract_text_bytes(pdf_bytes, high_fidelity=high_fidelity)
 
 def convert_pdf_to_txt(uploaded_file):
     """Converte PDF para TXT"""
+    high_fidelity = _high_fidelity_checkbox()
+    
     if st.button("🚀 Converter para TXT", type="primary"):
-        with st.spinner("Convertendo PDF para TXT..."):
-            try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                    tmp_file.write(uploaded_file.getvalue())
-                    tmp_path = tmp_file.name
-                
-                texto = extract_text(tmp_path) or ""
-                output_name = "documento.txt"
-                
-                with open(output_name, "w", encoding="utf-8") as f:
-                    f.write(texto)
-                
-                os.unlink(tmp_path)
-                
-                with open(output_name, "rb") as file:
-                    st.download_button(
-                        label="📥 Baixar documento.txt",
-                        data=file.read(),
-                        file_name=output_name,
-                        mime="text/plain"
-                    )
-                st.success("✅ Conversão concluída!")
-            except Exception as e:
-                st.error(f"❌ Erro: {str(e)}")
-            finally:
-                if os.path.exists(output_name):
-                    os.remove(output_name)
+        try:
+            data = _run_in_background(
+                "Convertendo PDF para TXT...", _convert_pdf_to_txt_impl, uploaded_file.getvalue(), high_fidelity
+            )
+            st.download_button(label="📥 Baixar documento.txt", data=data, file_name="documento.txt", mime="text/plain")
+            st.success("✅ Conversão concluída!")
+        except Exception as e:
+            st.error(f"❌ Erro: {str(e)}")
 
 def convert_pdf_to_rtf(uploaded_file):
     """Converte PDF para RTF"""
     if st.button("🚀 Converter para RTF", type="primary"):
-        with st.spinner("Convertendo PDF para RTF..."):
-            try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                    tmp_file.write(uploaded_file.getvalue())
-                    tmp_path = tmp_file.name
-                
-                output_name = "documento.rtf"
-                temp_dir = tempfile.mkdtemp()
-                converted_path = _libreoffice_convert(tmp_path, temp_dir, "rtf")
-                os.rename(converted_path, output_name)
-                
-                os.unlink(tmp_path)
-                shutil.rmtree(temp_dir)
-                
-                with open(output_name, "rb") as file:
-                    st.download_button(
-                        label="📥 Baixar documento.rtf",
-                        data=file.read(),
-                        file_name=output_name,
-                        mime="application/rtf"
-                    )
-                st.success("✅ Conversão concluída!")
-            except Exception as e:
-                st.error(f"❌ Erro: {str(e)}")
-            finally:
-                if os.path.exists(output_name):
-                    os.remove(output_name)
-
-def convert_pdf_to_html(uploaded_file):
-    """Converte PDF para HTML (Páginas Web)"""
-    if st.button("🚀 Converter para HTML", type="primary"):
-        with st.spinner("Convertendo PDF para HTML..."):
-            try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                    tmp_file.write(uploaded_file.getvalue())
-                    tmp_path = tmp_file.name
-                
-                texto = extract_text(tmp_path) or ""
-                content = f"""<!DOCTYPE html>
+        try:
+            data = _run_in_background(
+                "Convertendo PDF para RTF...", _libreoffice_convert_bytes, uploaded_file.getvalue(), "entrada.pdf", "rtf"
+            )
+            st.download_button(label="📥 Baixar documento.rtf", data=data, file_name="documento.rtf", mime="application/rtf")
+            st.success("✅ Conversão concluída!")
+        except Exception as e:
+            st.error(f"❌ Erro: {str(e)}")
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _convert_pdf_to_html_impl(pdf_bytes: bytes, high_fidelity: bool) -> bytes:
+    """Núcleo da conversão PDF → HTML: o texto extraído vai escapado dentro de um <pre>."""
+    header = """<!DOCTYPE html>
 <html lang="pt-br">
 <head>
     <meta charset="utf-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Documento PDF Convertido</title>
     <style>
-        body {{ font-family: Arial, sans-serif; padding: 20px; line-height: 1.6; }}
-        pre {{ white-space: pre-wrap; word-wrap: break-word; }}
+        body { font-family: Arial, sans-serif; padding: 20px; line-height: 1.6; }
+        pre { white-space: pre-wrap; word-wrap: break-word; }
     </style>
 </head>
 <body>
-    <pre>{texto}</pre>
+    <pre>"""
+    footer = """</pre>
 </body>
 </html>"""
-                output_name = "documento.html"
-                
-                with open(output_name, "w", encoding="utf-8") as f:
-                    f.write(content)
-                
-                os.unlink(tmp_path)
-                
-                with open(output_name, "rb") as file:
-                    st.download_button(
-                        label="📥 Baixar documento.html",
-                        data=file.read(),
-                        file_name=output_name,
-                        mime="text/html"
-                    )
-                st.success("✅ Conversão concluída!")
-            except Exception as e:
-                st.error(f"❌ Erro: {str(e)}")
-            finally:
-                if os.path.exists(output_name):
-                    os.remove(output_name)
+    return _extract_text_bytes(
+        pdf_bytes,
+        header=header,
+        footer=footer,
+        escape_fn=lambda t: html.escape(t, quote=False),
+        high_fidelity=high_fidelity
+    )
+
+def convert_pdf_to_html(uploaded_file):
+    """Converte PDF para HTML (Páginas Web)"""
+    high_fidelity = _high_fidelity_checkbox()
+    
+    if st.button("🚀 Converter para HTML", type="primary"):
+        try:
+            data = _run_in_background(
+                "Convertendo PDF para HTML...", _convert_pdf_to_html_impl, uploaded_file.getvalue(), high_fidelity
+            )
+            st.download_button(label="📥 Baixar documento.html", data=data, file_name="documento.html", mime="text/html")
+            st.success("✅ Conversão concluída!")
+        except Exception as e:
+            st.error(f"❌ Erro: {str(e)}")
 
 # ============================================================================
 # SEÇÃO 2: Converter arquivos em arquivos PDF
@@ -1366,11 +2096,19 @@ def show_convert_files_to_pdf():
             "TXT para PDF": ['txt'],
             "RTF para PDF": ['rtf']
         }
-        uploaded_file = st.file_uploader(
+        # Conversões via LibreOffice aceitam vários arquivos, convertidos em lote
+        multiple = conversion_type != "TXT para PDF"
+        uploaded = st.file_uploader(
             f"Escolha um arquivo {conversion_type.split(' para ')[0]}",
-            type=file_type_map[conversion_type]
+            type=file_type_map[conversion_type],
+            accept_multiple_files=multiple
         )
-        
+
+        if multiple and uploaded and len(uploaded) > 1:
+            convert_office_files_to_pdf(uploaded)
+            return
+        uploaded_file = uploaded[0] if multiple and uploaded else uploaded
+
         if uploaded_file:
             if conversion_type == "Word para PDF":
                 convert_word_to_pdf(uploaded_file)
@@ -1386,209 +2124,211 @@ def show_convert_files_to_pdf():
 def convert_word_to_pdf(uploaded_file):
     """Converte Word para PDF"""
     if st.button("🚀 Converter para PDF", type="primary"):
-        with st.spinner("Convertendo Word para PDF..."):
-            try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{uploaded_file.name.split(".")[-1]}') as tmp_file:
-                    tmp_file.write(uploaded_file.getvalue())
-                    tmp_path = tmp_file.name
-                
-                output_name = "documento.pdf"
-                temp_dir = tempfile.mkdtemp()
-                converted_path = _libreoffice_convert(tmp_path, temp_dir, "pdf")
-                os.rename(converted_path, output_name)
-                
-                os.unlink(tmp_path)
-                shutil.rmtree(temp_dir)
-                
-                with open(output_name, "rb") as file:
-                    st.download_button(
-                        label="📥 Baixar documento.pdf",
-                        data=file.read(),
-                        file_name=output_name,
-                        mime="application/pdf"
-                    )
-                st.success("✅ Conversão concluída!")
-            except Exception as e:
-                st.error(f"❌ Erro: {str(e)}")
-            finally:
-                if os.path.exists(output_name):
-                    os.remove(output_name)
+        try:
+            data = _run_in_background(
+                "Convertendo Word para PDF...", _libreoffice_convert_bytes, uploaded_file.getvalue(), f'entrada.{uploaded_file.name.split(".")[-1]}', "pdf"
+            )
+            st.download_button(label="📥 Baixar documento.pdf", data=data, file_name="documento.pdf", mime="application/pdf")
+            st.success("✅ Conversão concluída!")
+        except Exception as e:
+            st.error(f"❌ Erro: {str(e)}")
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _convert_office_files_to_pdf_impl(files: List[Tuple[str, bytes]]) -> bytes:
+    """Núcleo da conversão em lote: recebe (nome, bytes) de cada arquivo e devolve um ZIP com os PDFs."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Fila de conversão agrupada por extensão de entrada
+        queue = defaultdict(list)
+        arc_names = {}
+        for i, (name, data) in enumerate(files):
+            stem = Path(name).stem
+            ext = Path(name).suffix.lower()
+            tmp_path = _stage_input(data, temp_dir, f"{i:03d}_{stem}{ext}")
+            queue[ext].append(tmp_path)
+            arc_name = f"{stem}.pdf"
+            if arc_name in arc_names.values():
+                arc_name = f"{stem}_{i+1}.pdf"
+            arc_names[tmp_path] = arc_name
+
+        output_dir = os.path.join(temp_dir, "convertidos")
+        zip_buffer = io.BytesIO()
+        with zipfile.ZipFile(zip_buffer, 'w') as zip_file:
+            for paths in queue.values():
+                converted_paths = _libreoffice_convert_batch(paths, output_dir, "pdf")
+                for tmp_path, converted in zip(paths, converted_paths):
+                    zip_file.write(converted, arc_names[tmp_path])
+        return zip_buffer.getvalue()
+
+def convert_office_files_to_pdf(uploaded_files):
+    """Converte vários arquivos Office/RTF para PDF em lote (uma chamada ao LibreOffice por lote)"""
+    if st.button("🚀 Converter para PDF", type="primary"):
+        try:
+            data = _run_in_background(
+                f"Convertendo {len(uploaded_files)} arquivos para PDF...", _convert_office_files_to_pdf_impl, [(f.name, f.getvalue()) for f in uploaded_files]
+            )
+            st.download_button(
+                label=f"📥 Baixar ZIP com {len(uploaded_files)} PDFs",
+                data=data,
+                file_name="documentos_pdf.zip",
+                mime="application/zip"
+            )
+            st.success(f"✅ {len(uploaded_files)} arquivos convertidos!")
+        except Exception as e:
+            st.error(f"❌ Erro: {str(e)}")
 
 def convert_excel_to_pdf(uploaded_file):
     """Converte Excel para PDF"""
     if st.button("🚀 Converter para PDF", type="primary"):
-        with st.spinner("Convertendo Excel para PDF..."):
-            try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{uploaded_file.name.split(".")[-1]}') as tmp_file:
-                    tmp_file.write(uploaded_file.getvalue())
-                    tmp_path = tmp_file.name
-                
-                output_name = "planilha.pdf"
-                temp_dir = tempfile.mkdtemp()
-                converted_path = _libreoffice_convert(tmp_path, temp_dir, "pdf")
-                os.rename(converted_path, output_name)
-                
-                os.unlink(tmp_path)
-                shutil.rmtree(temp_dir)
-                
-                with open(output_name, "rb") as file:
-                    st.download_button(
-                        label="📥 Baixar planilha.pdf",
-                        data=file.read(),
-                        file_name=output_name,
-                        mime="application/pdf"
-                    )
-                st.success("✅ Conversão concluída!")
-            except Exception as e:
-                st.error(f"❌ Erro: {str(e)}")
-            finally:
-                if os.path.exists(output_name):
-                    os.remove(output_name)
+        try:
+            data = _run_in_background(
+                "Convertendo Excel para PDF...", _libreoffice_convert_bytes, uploaded_file.getvalue(), f'entrada.{uploaded_file.name.split(".")[-1]}', "pdf"
+            )
+            st.download_button(label="📥 Baixar planilha.pdf", data=data, file_name="planilha.pdf", mime="application/pdf")
+            st.success("✅ Conversão concluída!")
+        except Exception as e:
+            st.error(f"❌ Erro: {str(e)}")
 
 def convert_ppt_to_pdf(uploaded_file):
     """Converte PowerPoint para PDF"""
     if st.button("🚀 Converter para PDF", type="primary"):
-        with st.spinner("Convertendo PowerPoint para PDF..."):
-            try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{uploaded_file.name.split(".")[-1]}') as tmp_file:
-                    tmp_file.write(uploaded_file.getvalue())
-                    tmp_path = tmp_file.name
-                
-                output_name = "apresentacao.pdf"
-                temp_dir = tempfile.mkdtemp()
-                converted_path = _libreoffice_convert(tmp_path, temp_dir, "pdf")
-                os.rename(converted_path, output_name)
-                
-                os.unlink(tmp_path)
-                shutil.rmtree(temp_dir)
-                
-                with open(output_name, "rb") as file:
-                    st.download_button(
-                        label="📥 Baixar apresentacao.pdf",
-                        data=file.read(),
-                        file_name=output_name,
-                        mime="application/pdf"
-                    )
-                st.success("✅ Conversão concluída!")
-            except Exception as e:
-                st.error(f"❌ Erro: {str(e)}")
-            finally:
-                if os.path.exists(output_name):
-                    os.remove(output_name)
+        try:
+            data = _run_in_background(
+                "Convertendo PowerPoint para PDF...", _libreoffice_convert_bytes, uploaded_file.getvalue(), f'entrada.{uploaded_file.name.split(".")[-1]}', "pdf"
+            )
+            st.download_button(label="📥 Baixar apresentacao.pdf", data=data, file_name="apresentacao.pdf", mime="application/pdf")
+            st.success("✅ Conversão concluída!")
+        except Exception as e:
+            st.error(f"❌ Erro: {str(e)}")
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _convert_images_to_pdf_impl(images_data: List[bytes], target_dpi: Optional[int]) -> bytes:
+    """Núcleo da conversão Imagens → PDF: uma página por imagem, montada direto na memória."""
+    if IMG2PDF_AVAILABLE:
+        # JPEGs são copiados byte a byte para o PDF, sem passar por um bitmap
+        prepared = [_image_bytes_for_pdf(data, target_dpi) for data in images_data]
+        return img2pdf.convert(
+            [image_bytes for image_bytes, _ in prepared],
+            layout_fun=_page_dpi_layout([page_dpi for _, page_dpi in prepared])
+        )
+    
+    images = []
+    page_dpis = []
+    for data in images_data:
+        # HEIC/HEIF abre pelo opener do pillow-heif registrado na importação
+        img = Image.open(io.BytesIO(data))
+        # Como no img2pdf: só as imagens reduzidas ficam em target_dpi
+        resized = bool(target_dpi) and _shrink_to_page(img, target_dpi)
+        page_dpis.append(target_dpi if resized else PDF_DEFAULT_DPI)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        images.append(img)
+    
+    if not images:
+        raise ValueError("Nenhuma imagem válida encontrada.")
+    
+    if len(set(page_dpis)) == 1:
+        output = io.BytesIO()
+        primeira, restantes = images[0], images[1:]
+        primeira.save(output, "PDF", save_all=True, append_images=restantes, resolution=float(page_dpis[0]))
+        return output.getvalue()
+    
+    # O save_all do Pillow usa uma só resolução para todas as páginas: com DPIs
+    # diferentes, cada imagem vira um PDF próprio e as páginas são unidas
+    writer = PdfWriter()
+    for img, page_dpi in zip(images, page_dpis):
+        page = io.BytesIO()
+        img.save(page, "PDF", resolution=float(page_dpi))
+        writer.append(PdfReader(page))
+    return _writer_bytes(writer)
 
 def convert_images_to_pdf(uploaded_files):
     """Converte imagens para PDF"""
+    limit_size = st.checkbox("Reduzir imagens grandes", help="Imagens maiores que uma página A4 no DPI alvo são reduzidas")
+    target_dpi = st.slider("DPI alvo:", 72, 300, 150, disabled=not limit_size)
+    if not limit_size:
+        target_dpi = None
+    
     if st.button("🚀 Converter para PDF", type="primary"):
-        with st.spinner("Convertendo imagens para PDF..."):
-            try:
-                pil_images = []
-                for uploaded_file in uploaded_files:
-                    img = Image.open(uploaded_file)
-                    if uploaded_file.name.lower().endswith(('.heic', '.heif')):
-                        if img.mode in ("RGBA", "P"):
-                            img = img.convert("RGB")
-                    else:
-                        if img.mode in ("RGBA", "P"):
-                            img = img.convert("RGB")
-                    pil_images.append(img)
-                
-                if not pil_images:
-                    st.error("❌ Nenhuma imagem válida encontrada.")
-                    return
-                
-                output_name = "imagens_convertidas.pdf"
-                primeira, restantes = pil_images[0], pil_images[1:]
-                primeira.save(output_name, save_all=True, append_images=restantes)
-                
-                with open(output_name, "rb") as file:
-                    st.download_button(
-                        label="📥 Baixar PDF",
-                        data=file.read(),
-                        file_name=output_name,
-                        mime="application/pdf"
-                    )
-                st.success(f"✅ PDF com {len(pil_images)} imagens gerado!")
-            except Exception as e:
-                st.error(f"❌ Erro: {str(e)}")
-            finally:
-                if os.path.exists(output_name):
-                    os.remove(output_name)
+        try:
+            data = _run_in_background(
+                "Convertendo imagens para PDF...", _convert_images_to_pdf_impl, [f.getvalue() for f in uploaded_files], target_dpi
+            )
+            st.download_button(label="📥 Baixar PDF", data=data, file_name="imagens_convertidas.pdf", mime="application/pdf")
+            st.success(f"✅ PDF com {len(uploaded_files)} imagens gerado!")
+        except Exception as e:
+            st.error(f"❌ Erro: {str(e)}")
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _convert_txt_to_pdf_impl(text_bytes: bytes, font_size: int) -> bytes:
+    """Núcleo da conversão TXT → PDF: texto em Helvetica numa página A4, com quebra das linhas largas."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.units import inch
+    from reportlab.lib.utils import simpleSplit
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+    
+    texto = text_bytes.decode('utf-8', errors='ignore')
+    output = io.BytesIO()
+    
+    c = canvas.Canvas(output, pagesize=A4)
+    width, height = A4
+    margin = inch
+    line_height = font_size * 1.2
+    max_width = width - 2 * margin
+    lines_per_page = int((height - 2 * margin) // line_height) + 1
+    
+    def new_text_object():
+        # Um único objeto de texto por página, com a fonte definida uma vez
+        text_object = c.beginText(margin, height - margin)
+        text_object.setFont("Helvetica", font_size, leading=line_height)
+        return text_object
+    
+    text_object = new_text_object()
+    lines_on_page = 0
+    for line in texto.splitlines():
+        # Quebrar linhas largas em vez de truncá-las
+        if stringWidth(line, "Helvetica", font_size) <= max_width:
+            segments = [line]
+        else:
+            segments = simpleSplit(line, "Helvetica", font_size, max_width)
+        for segment in segments:
+            if lines_on_page == lines_per_page:
+                c.drawText(text_object)
+                c.showPage()
+                text_object = new_text_object()
+                lines_on_page = 0
+            text_object.textLine(segment)
+            lines_on_page += 1
+    
+    c.drawText(text_object)
+    c.save()
+    return output.getvalue()
 
 def convert_txt_to_pdf(uploaded_file):
     """Converte TXT para PDF"""
     font_size = st.slider("Tamanho da fonte:", 8, 24, 12)
     
     if st.button("🚀 Converter para PDF", type="primary"):
-        with st.spinner("Convertendo TXT para PDF..."):
-            try:
-                from reportlab.lib.pagesizes import letter, A4
-                from reportlab.pdfgen import canvas
-                from reportlab.lib.units import inch
-                
-                texto = uploaded_file.read().decode('utf-8', errors='ignore')
-                output_name = "documento.pdf"
-                
-                c = canvas.Canvas(output_name, pagesize=A4)
-                width, height = A4
-                margin = inch
-                y = height - margin
-                line_height = font_size * 1.2
-                
-                lines = texto.split('\n')
-                for line in lines:
-                    if y < margin:
-                        c.showPage()
-                        y = height - margin
-                    c.setFont("Helvetica", font_size)
-                    c.drawString(margin, y, line[:100])  # Limitar largura
-                    y -= line_height
-                
-                c.save()
-                
-                with open(output_name, "rb") as file:
-                    st.download_button(
-                        label="📥 Baixar documento.pdf",
-                        data=file.read(),
-                        file_name=output_name,
-                        mime="application/pdf"
-                    )
-                st.success("✅ Conversão concluída!")
-            except Exception as e:
-                st.error(f"❌ Erro: {str(e)}")
-            finally:
-                if os.path.exists(output_name):
-                    os.remove(output_name)
+        try:
+            data = _run_in_background(
+                "Convertendo TXT para PDF...", _convert_txt_to_pdf_impl, uploaded_file.getvalue(), font_size
+            )
+            st.download_button(label="📥 Baixar documento.pdf", data=data, file_name="documento.pdf", mime="application/pdf")
+            st.success("✅ Conversão concluída!")
+        except Exception as e:
+            st.error(f"❌ Erro: {str(e)}")
 
 def convert_rtf_to_pdf(uploaded_file):
     """Converte RTF para PDF"""
     if st.button("🚀 Converter para PDF", type="primary"):
-        with st.spinner("Convertendo RTF para PDF..."):
-            try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.rtf') as tmp_file:
-                    tmp_file.write(uploaded_file.getvalue())
-                    tmp_path = tmp_file.name
-                
-                output_name = "documento.pdf"
-                temp_dir = tempfile.mkdtemp()
-                converted_path = _libreoffice_convert(tmp_path, temp_dir, "pdf")
-                os.rename(converted_path, output_name)
-                
-                os.unlink(tmp_path)
-                shutil.rmtree(temp_dir)
-                
-                with open(output_name, "rb") as file:
-                    st.download_button(
-                        label="📥 Baixar documento.pdf",
-                        data=file.read(),
-                        file_name=output_name,
-                        mime="application/pdf"
-                    )
-                st.success("✅ Conversão concluída!")
-            except Exception as e:
-                st.error(f"❌ Erro: {str(e)}")
-            finally:
-                if os.path.exists(output_name):
-                    os.remove(output_name)
+        try:
+            data = _run_in_background(
+                "Convertendo RTF para PDF...", _libreoffice_convert_bytes, uploaded_file.getvalue(), "entrada.rtf", "pdf"
+            )
+            st.download_button(label="📥 Baixar documento.pdf", data=data, file_name="documento.pdf", mime="application/pdf")
+            st.success("✅ Conversão concluída!")
+        except Exception as e:
+            st.error(f"❌ Erro: {str(e)}")
 
 # ============================================================================
 # SEÇÃO 3: Gerenciar páginas
@@ -1606,7 +2346,8 @@ def show_manage_pages():
             "Inserir páginas",
             "Cortar páginas",
             "Extrair páginas",
-            "Girar páginas"
+            "Girar páginas",
+            "Fluxo combinado"
         ]
     )
     
@@ -1624,6 +2365,61 @@ def show_manage_pages():
         show_extract_pages()
     elif operation == "Girar páginas":
         show_rotate_pages()
+    elif operation == "Fluxo combinado":
+        show_combined_flow()
+
+def _run_pdf_op(spinner_text: str, output_name: str, success_text: str, build: Callable[[], bytes]) -> None:
+    """Roteiro comum das operações de página: gera o PDF, oferece o download e trata erros."""
+    with st.spinner(spinner_text):
+        try:
+            pdf_bytes = build()
+            st.download_button(
+                label="📥 Baixar PDF",
+                data=pdf_bytes,
+                file_name=output_name,
+                mime="application/pdf"
+            )
+            st.success(success_text)
+        except Exception as e:
+            st.error(f"❌ Erro: {str(e)}")
+
+def _select_pages(pdf_data: bytes, indices: List[int]) -> bytes:
+    """Novo PDF só com as páginas indicadas (0-based), na ordem dada."""
+    if PIKEPDF_AVAILABLE or QPDF_PATH:
+        return _assemble_pages([(pdf_data, indices)])
+    writer = PdfWriter()
+    with _shared_reader(pdf_data) as reader:
+        writer.append(reader, pages=indices)
+    return _writer_bytes(writer)
+
+def _merge_with_pypdf(pdfs: List[bytes]) -> bytes:
+    """Mescla PDFs com o pypdf, analisando cada arquivo uma única vez numa thread do pool."""
+    writer = PdfWriter()
+    
+    def parse(data: bytes) -> PdfReader:
+        # Reader próprio, fora do _shared_reader: as threads do pool não têm ScriptRunContext,
+        # então o st.cache_resource não guardaria nada e o arquivo seria analisado de novo
+        return PdfReader(io.BytesIO(data))
+    
+    # Os arquivos são lidos em paralelo; o writer só é alterado aqui, na ordem do upload.
+    # A janela tem workers + 1 futures: cada worker tem sempre um arquivo para analisar
+    # enquanto esta thread faz o append, e no máximo workers + 1 readers (em análise ou
+    # prontos) existem ao mesmo tempo, além do que está sendo anexado. Cada reader só é
+    # referenciado pelo seu future e é liberado depois do append, então a memória
+    # acompanha a janela e não o número de arquivos
+    workers = max(1, min(4, os.cpu_count() or 1, len(pdfs)))
+    remaining = iter(pdfs)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque(executor.submit(parse, data) for data in itertools.islice(remaining, workers + 1))
+        while pending:
+            reader = pending.popleft().result()
+            next_data = next(remaining, None)
+            if next_data is not None:
+                pending.append(executor.submit(parse, next_data))
+            writer.append(reader)
+            del reader
+    return _writer_bytes(writer)
+
 
 def show_merge_pdfs():
     """Mescla múltiplos PDFs"""
@@ -1636,34 +2432,25 @@ def show_merge_pdfs():
     if uploaded_files and len(uploaded_files) > 1 and st.button("🚀 Mesclar PDFs", type="primary"):
         with st.spinner("Mesclando PDFs..."):
             try:
-                writer = PdfWriter()
-                
-                for uploaded_file in uploaded_files:
-                    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                        tmp_file.write(uploaded_file.getvalue())
-                        tmp_path = tmp_file.name
-                    
-                    reader = PdfReader(tmp_path)
-                    for page in reader.pages:
-                        writer.add_page(page)
-                    os.unlink(tmp_path)
+                if PIKEPDF_AVAILABLE or QPDF_PATH:
+                    pdf_bytes = _assemble_pages([(f.getvalue(), None) for f in uploaded_files])
+                else:
+                    pdf_bytes = _merge_with_pypdf([f.getvalue() for f in uploaded_files])
                 
                 output_name = "pdf_mesclado.pdf"
-                _save_writer(writer, output_name)
                 
-                with open(output_name, "rb") as file:
-                    st.download_button(
-                        label="📥 Baixar PDF mesclado",
-                        data=file.read(),
-                        file_name=output_name,
-                        mime="application/pdf"
-                    )
+                st.download_button(
+                    label="📥 Baixar PDF mesclado",
+                    data=pdf_bytes,
+                    file_name=output_name,
+                    mime="application/pdf"
+                )
                 st.success(f"✅ {len(uploaded_files)} PDFs mesclados com sucesso!")
             except Exception as e:
                 st.error(f"❌ Erro: {str(e)}")
-            finally:
-                if os.path.exists(output_name):
-                    os.remove(output_name)
+
+# Páginas mínimas por tarefa ao dividir um PDF em paralelo (cada tarefa relê o PDF)
+SPLIT_MIN_PAGES_PER_TASK = 50
 
 def show_split_pdf():
     """Divide PDF em páginas individuais"""
@@ -1672,40 +2459,53 @@ def show_split_pdf():
     if uploaded_file and st.button("🚀 Dividir PDF", type="primary"):
         with st.spinner("Dividindo PDF..."):
             try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                    tmp_file.write(uploaded_file.getvalue())
-                    tmp_path = tmp_file.name
-                
-                reader = PdfReader(tmp_path)
-                temp_dir = tempfile.mkdtemp()
-                
-                for i, page in enumerate(reader.pages):
-                    writer = PdfWriter()
-                    writer.add_page(page)
-                    output_path = os.path.join(temp_dir, f"pagina_{i+1}.pdf")
-                    _save_writer(writer, output_path)
-                
-                zip_path = "pdf_dividido.zip"
-                with zipfile.ZipFile(zip_path, 'w') as zip_file:
-                    for file_name in os.listdir(temp_dir):
-                        zip_file.write(os.path.join(temp_dir, file_name), file_name)
-                
-                os.unlink(tmp_path)
-                shutil.rmtree(temp_dir)
-                
-                with open(zip_path, "rb") as file:
-                    st.download_button(
-                        label=f"📥 Baixar ZIP com {len(reader.pages)} páginas",
-                        data=file.read(),
-                        file_name=zip_path,
-                        mime="application/zip"
-                    )
-                st.success(f"✅ PDF dividido em {len(reader.pages)} páginas!")
+                pdf_bytes = uploaded_file.getvalue()
+                total_pages = _get_page_count(pdf_bytes)
+                # O pypdf segura o GIL: só vale dividir em tarefas grandes, com poucos workers
+                workers = max(1, min(4, os.cpu_count() or 1, total_pages // SPLIT_MIN_PAGES_PER_TASK))
+                ranges = _page_ranges(list(range(total_pages)), math.ceil(total_pages / workers))
+                
+                def split_range(page_range: Tuple[int, int]) -> List[Tuple[int, bytes]]:
+                    if QPDF_PATH and not PIKEPDF_AVAILABLE:
+                        return list(enumerate(_qpdf_split(pdf_bytes, *page_range), start=page_range[0]))
+                    pages = []
+                    if PIKEPDF_AVAILABLE:
+                        # O PDF de origem é aberto uma vez por tarefa, não uma vez por página
+                        with pikepdf.open(io.BytesIO(pdf_bytes)) as src:
+                            source_pages = src.pages
+                            for i in range(page_range[0], page_range[1] + 1):
+                                output = io.BytesIO()
+                                with pikepdf.Pdf.new() as out:
+                                    out.pages.append(source_pages[i])
+                                    out.save(output)
+                                pages.append((i, output.getvalue()))
+                        return pages
+                    # O PdfReader não é thread-safe (lê de um stream compartilhado): um por tarefa.
+                    # reader.pages monta uma lista virtual nova a cada acesso: fica fora do laço
+                    source_pages = PdfReader(io.BytesIO(pdf_bytes)).pages
+                    for i in range(page_range[0], page_range[1] + 1):
+                        writer = PdfWriter()
+                        writer.add_page(source_pages[i])
+                        pages.append((i, _writer_bytes(writer)))
+                    return pages
+                
+                # Cada página vira um PDF em memória, gravado direto no ZIP na ordem original
+                zip_buffer = io.BytesIO()
+                with zipfile.ZipFile(zip_buffer, 'w', compression=zipfile.ZIP_DEFLATED) as zip_file:
+                    with ThreadPoolExecutor(max_workers=workers) as executor:
+                        for pages in executor.map(split_range, ranges):
+                            for i, page_bytes in pages:
+                                zip_file.writestr(f"pagina_{i+1}.pdf", page_bytes)
+                
+                st.download_button(
+                    label=f"📥 Baixar ZIP com {total_pages} páginas",
+                    data=zip_buffer.getvalue(),
+                    file_name="pdf_dividido.zip",
+                    mime="application/zip"
+                )
+                st.success(f"✅ PDF dividido em {total_pages} páginas!")
             except Exception as e:
                 st.error(f"❌ Erro: {str(e)}")
-            finally:
-                if os.path.exists(zip_path):
-                    os.remove(zip_path)
 
 def show_remove_pages():
     """Remove páginas do PDF"""
@@ -1713,37 +2513,12 @@ def show_remove_pages():
     pages_input = st.text_input("Páginas para remover (ex: 2,5,8-10):", placeholder="2,5,8-10")
     
     if uploaded_file and st.button("🚀 Remover páginas", type="primary"):
-        with st.spinner("Removendo páginas..."):
-            try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                    tmp_file.write(uploaded_file.getvalue())
-                    tmp_path = tmp_file.name
-                
-                reader = PdfReader(tmp_path)
-                writer = PdfWriter()
-                remove_set = set(_parse_pages(pages_input, len(reader.pages)))
-                
-                for i, page in enumerate(reader.pages):
-                    if i not in remove_set:
-                        writer.add_page(page)
-                
-                output_name = "paginas_removidas.pdf"
-                _save_writer(writer, output_name)
-                os.unlink(tmp_path)
-                
-                with open(output_name, "rb") as file:
-                    st.download_button(
-                        label="📥 Baixar PDF",
-                        data=file.read(),
-                        file_name=output_name,
-                        mime="application/pdf"
-                    )
-                st.success("✅ Páginas removidas!")
-            except Exception as e:
-                st.error(f"❌ Erro: {str(e)}")
-            finally:
-                if os.path.exists(output_name):
-                    os.remove(output_name)
+        def build() -> bytes:
+            pdf_data = uploaded_file.getvalue()
+            keep = np.flatnonzero(~_page_mask(pages_input, _get_page_count(pdf_data))).tolist()
+            return _select_pages(pdf_data, keep)
+        
+        _run_pdf_op("Removendo páginas...", "paginas_removidas.pdf", "✅ Páginas removidas!", build)
 
 def show_insert_pages():
     """Insere páginas de um PDF em outro"""
@@ -1756,50 +2531,31 @@ def show_insert_pages():
     position = st.number_input("Inserir após a página:", min_value=0, value=0)
     
     if base_pdf and insert_pdf and st.button("🚀 Inserir páginas", type="primary"):
-        with st.spinner("Inserindo páginas..."):
-            try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_base:
-                    tmp_base.write(base_pdf.getvalue())
-                    tmp_base_path = tmp_base.name
-                
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_insert:
-                    tmp_insert.write(insert_pdf.getvalue())
-                    tmp_insert_path = tmp_insert.name
-                
-                base_reader = PdfReader(tmp_base_path)
-                insert_reader = PdfReader(tmp_insert_path)
-                writer = PdfWriter()
-                
+        def build() -> bytes:
+            base_data = base_pdf.getvalue()
+            insert_data = insert_pdf.getvalue()
+            base_count = _get_page_count(base_data)
+            
+            if PIKEPDF_AVAILABLE or QPDF_PATH:
+                return _assemble_pages([
+                    (base_data, list(range(min(position, base_count)))),
+                    (insert_data, None),
+                    (base_data, list(range(position, base_count))),
+                ])
+            
+            writer = PdfWriter()
+            with _shared_reader(base_data) as base_reader, _shared_reader(insert_data) as insert_reader:
                 # Adicionar páginas até a posição
-                for i in range(min(position, len(base_reader.pages))):
-                    writer.add_page(base_reader.pages[i])
+                writer.append(base_reader, pages=list(range(min(position, base_count))))
                 
                 # Inserir páginas do segundo PDF
-                for page in insert_reader.pages:
-                    writer.add_page(page)
+                writer.append(insert_reader)
                 
                 # Adicionar páginas restantes do primeiro PDF
-                for i in range(position, len(base_reader.pages)):
-                    writer.add_page(base_reader.pages[i])
-                
-                output_name = "pdf_com_insercao.pdf"
-                _save_writer(writer, output_name)
-                os.unlink(tmp_base_path)
-                os.unlink(tmp_insert_path)
-                
-                with open(output_name, "rb") as file:
-                    st.download_button(
-                        label="📥 Baixar PDF",
-                        data=file.read(),
-                        file_name=output_name,
-                        mime="application/pdf"
-                    )
-                st.success("✅ Páginas inseridas!")
-            except Exception as e:
-                st.error(f"❌ Erro: {str(e)}")
-            finally:
-                if os.path.exists(output_name):
-                    os.remove(output_name)
+                writer.append(base_reader, pages=list(range(position, base_count)))
+            return _writer_bytes(writer)
+        
+        _run_pdf_op("Inserindo páginas...", "pdf_com_insercao.pdf", "✅ Páginas inseridas!", build)
 
 def show_crop_pages():
     """Corta páginas do PDF (extrai parte específica)"""
@@ -1807,36 +2563,11 @@ def show_crop_pages():
     pages_input = st.text_input("Páginas para cortar (ex: 1-3,7,10-12):", placeholder="1-3,7,10-12")
     
     if uploaded_file and st.button("🚀 Cortar páginas", type="primary"):
-        with st.spinner("Cortando páginas..."):
-            try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                    tmp_file.write(uploaded_file.getvalue())
-                    tmp_path = tmp_file.name
-                
-                reader = PdfReader(tmp_path)
-                writer = PdfWriter()
-                indices = _parse_pages(pages_input, len(reader.pages))
-                
-                for i in indices:
-                    writer.add_page(reader.pages[i])
-                
-                output_name = "paginas_cortadas.pdf"
-                _save_writer(writer, output_name)
-                os.unlink(tmp_path)
-                
-                with open(output_name, "rb") as file:
-                    st.download_button(
-                        label="📥 Baixar PDF",
-                        data=file.read(),
-                        file_name=output_name,
-                        mime="application/pdf"
-                    )
-                st.success("✅ Páginas cortadas!")
-            except Exception as e:
-                st.error(f"❌ Erro: {str(e)}")
-            finally:
-                if os.path.exists(output_name):
-                    os.remove(output_name)
+        def build() -> bytes:
+            pdf_data = uploaded_file.getvalue()
+            return _select_pages(pdf_data, _parse_pages(pages_input, _get_page_count(pdf_data)))
+        
+        _run_pdf_op("Cortando páginas...", "paginas_cortadas.pdf", "✅ Páginas cortadas!", build)
 
 def show_extract_pages():
     """Extrai páginas específicas"""
@@ -1844,36 +2575,11 @@ def show_extract_pages():
     pages_input = st.text_input("Páginas para extrair (ex: 1-3,7,10-12):", placeholder="1-3,7,10-12")
     
     if uploaded_file and st.button("🚀 Extrair páginas", type="primary"):
-        with st.spinner("Extraindo páginas..."):
-            try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                    tmp_file.write(uploaded_file.getvalue())
-                    tmp_path = tmp_file.name
-                
-                reader = PdfReader(tmp_path)
-                writer = PdfWriter()
-                indices = _parse_pages(pages_input, len(reader.pages))
-                
-                for i in indices:
-                    writer.add_page(reader.pages[i])
-                
-                output_name = "paginas_extraidas.pdf"
-                _save_writer(writer, output_name)
-                os.unlink(tmp_path)
-                
-                with open(output_name, "rb") as file:
-                    st.download_button(
-                        label="📥 Baixar PDF",
-                        data=file.read(),
-                        file_name=output_name,
-                        mime="application/pdf"
-                    )
-                st.success("✅ Páginas extraídas!")
-            except Exception as e:
-                st.error(f"❌ Erro: {str(e)}")
-            finally:
-                if os.path.exists(output_name):
-                    os.remove(output_name)
+        def build() -> bytes:
+            pdf_data = uploaded_file.getvalue()
+            return _select_pages(pdf_data, _parse_pages(pages_input, _get_page_count(pdf_data)))
+        
+        _run_pdf_op("Extraindo páginas...", "paginas_extraidas.pdf", "✅ Páginas extraídas!", build)
 
 def show_rotate_pages():
     """Gira páginas do PDF"""
@@ -1885,39 +2591,77 @@ def show_rotate_pages():
         pages_input = st.text_input("Páginas para girar (vazio = todas):", placeholder="1,3,5 ou vazio")
     
     if uploaded_file and st.button("🚀 Girar páginas", type="primary"):
-        with st.spinner("Girando páginas..."):
-            try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                    tmp_file.write(uploaded_file.getvalue())
-                    tmp_path = tmp_file.name
-                
-                reader = PdfReader(tmp_path)
-                writer = PdfWriter()
-                indices = set(_parse_pages(pages_input, len(reader.pages))) if pages_input else set(range(len(reader.pages)))
-                angle_val = int(angle)
-                
-                for i, page in enumerate(reader.pages):
-                    if i in indices:
-                        page.rotate(angle_val)
-                    writer.add_page(page)
-                
-                output_name = f"rotacionado_{angle}graus.pdf"
-                _save_writer(writer, output_name)
-                os.unlink(tmp_path)
-                
-                with open(output_name, "rb") as file:
-                    st.download_button(
-                        label="📥 Baixar PDF",
-                        data=file.read(),
-                        file_name=output_name,
-                        mime="application/pdf"
-                    )
-                st.success("✅ Páginas giradas!")
-            except Exception as e:
-                st.error(f"❌ Erro: {str(e)}")
-            finally:
-                if os.path.exists(output_name):
-                    os.remove(output_name)
+        def build() -> bytes:
+            pdf_data = uploaded_file.getvalue()
+            total_pages = _get_page_count(pdf_data)
+            mask = _page_mask(pages_input, total_pages) if pages_input else np.ones(total_pages, dtype=bool)
+            targets = np.flatnonzero(mask).tolist()
+            
+            if PIKEPDF_AVAILABLE:
+                # Girar só altera /Rotate: o qpdf regrava o arquivo sem copiar página nenhuma
+                output = io.BytesIO()
+                with pikepdf.open(io.BytesIO(pdf_data)) as pdf:
+                    for i in targets:
+                        pdf.pages[i].rotate(int(angle), relative=True)
+                    pdf.save(output)
+                return output.getvalue()
+            
+            writer = PdfWriter()
+            with _shared_reader(pdf_data) as reader:
+                writer.append(reader)
+            # Gira as cópias no writer: o reader em cache não pode ser alterado
+            for i in targets:
+                page = writer.pages[i]
+                page.rotation = (page.rotation + int(angle)) % 360
+            return _writer_bytes(writer)
+        
+        _run_pdf_op("Girando páginas...", f"rotacionado_{angle}graus.pdf", "✅ Páginas giradas!", build)
+
+def show_combined_flow():
+    """Remove, extrai e gira páginas numa única leitura e escrita do PDF"""
+    uploaded_file = st.file_uploader("Escolha um arquivo PDF", type=['pdf'])
+    st.caption("Os números de página referem-se ao PDF original.")
+    remove_input = st.text_input("Páginas para remover (opcional):", placeholder="2,5,8-10")
+    keep_input = st.text_input("Páginas para manter, na ordem (vazio = todas):", placeholder="1-3,7,10-12")
+    col1, col2 = st.columns(2)
+    with col1:
+        angle = st.selectbox("Girar:", ["0", "90", "180", "270"])
+    with col2:
+        rotate_input = st.text_input("Páginas para girar (vazio = todas):", placeholder="1,3,5 ou vazio")
+    
+    if uploaded_file and st.button("🚀 Aplicar operações", type="primary"):
+        def build() -> bytes:
+            pdf_data = uploaded_file.getvalue()
+            total_pages = _get_page_count(pdf_data)
+            removed = _page_mask(remove_input, total_pages)
+            order = _parse_pages(keep_input, total_pages) if keep_input else list(range(total_pages))
+            pages = [i for i in order if not removed[i]]
+            rotate = _page_mask(rotate_input, total_pages) if rotate_input else np.ones(total_pages, dtype=bool)
+            
+            if PIKEPDF_AVAILABLE:
+                # Como em show_rotate_pages: o qpdf copia as páginas finais e girar só altera /Rotate
+                output = io.BytesIO()
+                with pikepdf.open(io.BytesIO(pdf_data)) as src, pikepdf.Pdf.new() as pdf:
+                    for i in pages:
+                        pdf.pages.append(src.pages[i])
+                    if angle != "0":
+                        for position, i in enumerate(pages):
+                            if rotate[i]:
+                                pdf.pages[position].rotate(int(angle), relative=True)
+                    pdf.save(output)
+                return output.getvalue()
+            
+            # Uma única cópia das páginas finais; as rotações valem para as cópias no writer
+            writer = PdfWriter()
+            with _shared_reader(pdf_data) as reader:
+                writer.append(reader, pages=pages)
+            if angle != "0":
+                for position, i in enumerate(pages):
+                    if rotate[i]:
+                        writer.pages[position].rotate(int(angle))
+            return _writer_bytes(writer)
+        
+        _run_pdf_op("Aplicando operações...", "pdf_processado.pdf", "✅ Operações aplicadas!", build)
 
 # ============================================================================
 # SEÇÃO 4: Compactar e anotar
@@ -1943,6 +2687,45 @@ def show_compress_and_annotate():
         st.info("🚧 Funcionalidade em desenvolvimento. Em breve você poderá preencher formulários PDF interativamente.")
         st.warning("⚠️ Esta funcionalidade requer bibliotecas adicionais para manipulação de campos de formulário.")
 
+def _compress_page_contents(writer: PdfWriter, level: int) -> None:
+    """Equivale a compress_content_streams em todas as páginas, com a codificação em paralelo.
+    O zlib libera o GIL durante a compressão; as threads só leem o writer e os novos
+    streams são gravados nele depois, nesta thread (o PdfWriter não é thread-safe).
+    """
+    def encode(page):
+        content = page.get_contents()
+        return None if content is None else content.flate_encode(level)
+    
+    workers = max(1, min(4, os.cpu_count() or 1, len(writer.pages)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        encoded = list(executor.map(encode, writer.pages))
+    for page, content in zip(writer.pages, encoded):
+        if content is not None:
+            page.replace_contents(content)
+
+def _compress_pikepdf(pdf_data: bytes, compression_level: str) -> bytes:
+    """Recompacta com o qpdf: streams em Flate e objetos agrupados em object streams."""
+    output = io.BytesIO()
+    with pikepdf.open(io.BytesIO(pdf_data)) as pdf:
+        if compression_level == "Baixo (melhor qualidade)":
+            pdf.save(output)
+            return output.getvalue()
+        
+        high = compression_level == "Alto (menor tamanho)"
+        if high:
+            # Descartar miniaturas e recursos que nenhuma página usa
+            for page in pdf.pages:
+                if "/Thumb" in page.obj:
+                    del page.obj["/Thumb"]
+            pdf.remove_unreferenced_resources()
+        pdf.save(
+            output,
+            compress_streams=True,
+            object_stream_mode=pikepdf.ObjectStreamMode.generate,
+            recompress_flate=high
+        )
+    return output.getvalue()
+
 def show_compress_pdf():
     """Comprime PDF"""
     uploaded_file = st.file_uploader("Escolha um arquivo PDF", type=['pdf'])
@@ -1954,37 +2737,33 @@ def show_compress_pdf():
     if uploaded_file and st.button("🚀 Comprimir PDF", type="primary"):
         with st.spinner("Comprimindo PDF..."):
             try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                    tmp_file.write(uploaded_file.getvalue())
-                    tmp_path = tmp_file.name
-                
-                reader = PdfReader(tmp_path)
-                writer = PdfWriter()
+                pdf_data = uploaded_file.getvalue()
                 
-                # Copiar todas as páginas
-                for page in reader.pages:
-                    writer.add_page(page)
-                
-                # Configurar compressão baseado no nível
-                if compression_level == "Alto (menor tamanho)":
-                    # Comprimir imagens e conteúdo
-                    for page_num in range(len(writer.pages)):
-                        writer.pages[page_num].compress_content_streams()
-                elif compression_level == "Médio (balanceado)":
-                    # Compressão moderada
-                    for page_num in range(len(writer.pages)):
-                        writer.pages[page_num].compress_content_streams()
+                if PIKEPDF_AVAILABLE:
+                    pdf_bytes = _compress_pikepdf(pdf_data, compression_level)
+                else:
+                    writer = PdfWriter()
+                    
+                    # Copiar todas as páginas
+                    with _shared_reader(pdf_data) as reader:
+                        writer.append(reader)
+                    
+                    # Configurar compressão baseado no nível
+                    if compression_level == "Alto (menor tamanho)":
+                        # Comprimir imagens e conteúdo
+                        _compress_page_contents(writer, level=9)
+                    elif compression_level == "Médio (balanceado)":
+                        # Compressão moderada
+                        _compress_page_contents(writer, level=-1)
+                    pdf_bytes = _writer_bytes(writer)
                 
                 output_name = "pdf_comprimido.pdf"
-                _save_writer(writer, output_name)
                 
                 # Mostrar tamanhos
-                original_size = os.path.getsize(tmp_path)
-                compressed_size = os.path.getsize(output_name)
+                original_size = len(pdf_data)
+                compressed_size = len(pdf_bytes)
                 reduction = ((original_size - compressed_size) / original_size) * 100
                 
-                os.unlink(tmp_path)
-                
                 col1, col2, col3 = st.columns(3)
                 with col1:
                     st.metric("Tamanho original", f"{original_size / 1024:.2f} KB")
@@ -1993,19 +2772,15 @@ def show_compress_pdf():
                 with col3:
                     st.metric("Redução", f"{reduction:.1f}%")
                 
-                with open(output_name, "rb") as file:
-                    st.download_button(
-                        label="📥 Baixar PDF comprimido",
-                        data=file.read(),
-                        file_name=output_name,
-                        mime="application/pdf"
-                    )
+                st.download_button(
+                    label="📥 Baixar PDF comprimido",
+                    data=pdf_bytes,
+                    file_name=output_name,
+                    mime="application/pdf"
+                )
                 st.success("✅ PDF comprimido!")
             except Exception as e:
                 st.error(f"❌ Erro: {str(e)}")
-            finally:
-                if os.path.exists(output_name):
-                    os.remove(output_name)
 
 def show_annotate_pdf():
     """Anota PDF com texto ou marca d'água"""
@@ -2039,19 +2814,19 @@ def show_scan_documents():
     """Interface para escanear documentos usando OCR"""
     st.header("🔍 Escanear Documentos (OCR)")
     
-    # Verificar status das dependências
-    missing_deps = []
-    if not TESSERACT_AVAILABLE:
-        missing_deps.append("pytesseract")
-    if not PDF2IMAGE_AVAILABLE:
-        missing_deps.append("pdf2image")
-    if not CV2_AVAILABLE:
-        missing_deps.append("opencv-python (opcional)")
-    
     # Verificar se o scanner está disponível (pytesseract e pdf2image são obrigatórios)
     if not SCANNER_AVAILABLE:
         st.error("❌ Módulo de scanner não está disponível.")
         
+        # Verificar status das dependências (só interessa quando algo falta)
+        missing_deps = []
+        if not (TESSERACT_AVAILABLE or TESSEROCR_AVAILABLE):
+            missing_deps.append("pytesseract")
+        if not PDF2IMAGE_AVAILABLE:
+            missing_deps.append("pdf2image")
+        if not CV2_AVAILABLE:
+            missing_deps.append("opencv-python (opcional)")
+        
         # Mostrar quais dependências estão faltando
         if missing_deps:
             st.warning(f"⚠️ Dependências faltando: {', '.join([d for d in missing_deps if 'opcional' not in d])}")
@@ -2087,7 +2862,7 @@ def show_scan_documents():
         # Mostrar status detalhado
         col1, col2, col3 = st.columns(3)
         with col1:
-            status = "✅" if TESSERACT_AVAILABLE else "❌"
+            status = "✅" if TESSERACT_AVAILABLE or TESSEROCR_AVAILABLE else "❌"
             st.markdown(f"**pytesseract**: {status}")
         with col2:
             status = "✅" if PDF2IMAGE_AVAILABLE else "❌"
@@ -2100,7 +2875,7 @@ def show_scan_documents():
     
     # Criar instância do scanner
     try:
-        scanner = create_scanner()
+        scanner = _get_scanner()
         if not scanner.is_available():
             st.warning("⚠️ Dependências do scanner não estão totalmente disponíveis.")
             st.info("""
@@ -2203,20 +2978,10 @@ def show_scan_documents():
             if st.button("📄 Converter para PDF (Sem OCR)", type="primary", key="direct_pdf_convert"):
                 with st.spinner("Convertendo imagem para PDF..."):
                     try:
-                        # Salvar arquivo temporário
-                        if uploaded_file.name:
-                            file_ext = uploaded_file.name.split('.')[-1].lower()
-                            base_name = Path(uploaded_file.name).stem
-                        else:
-                            file_ext = 'jpg'
-                            base_name = "documento"
-                        
-                        with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{file_ext}') as tmp_file:
-                            tmp_file.write(uploaded_file.getvalue())
-                            tmp_path = tmp_file.name
+                        base_name = Path(uploaded_file.name).stem if uploaded_file.name else "documento"
                         
-                        # Ler e converter imagem
-                        image = Image.open(tmp_path)
+                        # Ler e converter imagem direto do upload
+                        image = Image.open(io.BytesIO(uploaded_file.getvalue()))
                         if image.mode in ("RGBA", "P", "LA"):
                             image = image.convert("RGB")
                         
@@ -2239,12 +3004,6 @@ def show_scan_documents():
                                 mime="application/pdf",
                                 key=f"download_{pdf_key}"
                             )
-                        
-                        # Limpar arquivo temporário
-                        try:
-                            os.unlink(tmp_path)
-                        except:
-                            pass
                             
                     except Exception as e:
                         st.error(f"❌ Erro ao converter para PDF: {str(e)}")
@@ -2255,58 +3014,65 @@ def show_scan_documents():
         with col2:
             st.caption("Ou use OCR para extrair texto do documento")
     
-    # Processar arquivo com OCR
+    # Processar arquivo com OCR; o resultado fica no session_state, associado ao upload e
+    # às configurações usadas: ao mudar qualquer uma delas, o resultado antigo é descartado
+    scan_key = None
+    if uploaded_file:
+        scan_params = (file_type, lang, preprocess, enhance)
+        if file_type == "PDF":
+            scan_params += (dpi, pages_input or "")
+        params_hash = hashlib.blake2b(repr(scan_params).encode("utf-8"), digest_size=8).hexdigest()
+        scan_key = f"scan_{uploaded_file.file_id}_{params_hash}"
+    # Só o resultado do upload atual fica guardado: os de uploads anteriores (e o seletor
+    # de página associado) são descartados, para a sessão não crescer indefinidamente
+    current_keys = {scan_key, f"{scan_key}_page"} if scan_key else set()
+    for key in [k for k in st.session_state if k.startswith("scan_") and k not in current_keys]:
+        del st.session_state[key]
     if uploaded_file and st.button("🚀 Escanear Documento (OCR)", type="primary"):
         with st.spinner("Processando documento com OCR..."):
             try:
-                # Salvar arquivo temporário
-                if uploaded_file.name:
-                    file_ext = uploaded_file.name.split('.')[-1].lower()
-                else:
-                    # Se não tiver nome (câmera), usar jpg como padrão
-                    file_ext = 'jpg'
+                # O upload já está em memória; o scanner lê direto dos bytes
+                file_data = uploaded_file.getvalue()
                 
-                with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{file_ext}') as tmp_file:
-                    tmp_file.write(uploaded_file.getvalue())
-                    tmp_path = tmp_file.name
-                
-                # Manter referência ao caminho para uso posterior
-                original_image_path = tmp_path
-                
-                # Determinar páginas para processar
+                # Determinar páginas para processar; a contagem fica em cache e também
+                # é repassada ao scanner, que assim não precisa reabrir o PDF
                 pages = None
+                total_pages = None
+                if file_type == "PDF":
+                    total_pages = _get_page_count(file_data)
                 if file_type == "PDF" and pages_input:
-                    reader = PdfReader(tmp_path)
-                    pages = _parse_pages(pages_input, len(reader.pages))
+                    pages = _parse_pages(pages_input, total_pages)
                     # Converter para 1-based para o scanner
                     pages = [p + 1 for p in pages]
                 
                 # Escanear documento
                 if file_type == "PDF":
-                    result = scanner.scan_document(
-                        tmp_path,
+                    progress = st.progress(0.0, text="Reconhecendo texto das páginas...")
+                    result = scanner.scan_document_bytes(
+                        file_data,
                         file_type='pdf',
                         lang=lang,
                         dpi=dpi,
                         preprocess=preprocess,
                         enhance=enhance,
-                        pages=pages
+                        pages=pages,
+                        progress_callback=lambda done, total: progress.progress(
+                            done / total, text=f"Página {done} de {total} concluída"
+                        ),
+                        total_pages=total_pages
                     )
+                    progress.empty()
                 else:
-                    # Para imagens, verificar se o arquivo foi salvo corretamente
-                    if not os.path.exists(tmp_path):
-                        raise FileNotFoundError(f"Arquivo temporário não encontrado: {tmp_path}")
-                    
                     # Verificar se é uma imagem válida
                     try:
-                        test_image = Image.open(tmp_path)
+                        test_image = Image.open(io.BytesIO(file_data))
                         test_image.verify()
                     except Exception as img_error:
                         st.warning(f"⚠️ Aviso sobre a imagem: {str(img_error)}")
                     
                     # Processar OCR
-                    result = scanner.scan_document(
-                        tmp_path,
+                    result = scanner.scan_document_bytes(
+                        file_data,
                         file_type='image',
                         lang=lang,
                         preprocess=preprocess,
@@ -2328,7 +3094,7 @@ def show_scan_documents():
                         # Mostrar preview da imagem para debug
                         with st.expander("🔍 Visualizar imagem processada"):
                             try:
-                                img = Image.open(tmp_path)
+                                img = Image.open(io.BytesIO(file_data))
                                 st.image(img, caption="Imagem original", use_container_width=True)
                                 
                                 # Tentar mostrar imagem processada
@@ -2338,183 +3104,197 @@ def show_scan_documents():
                             except Exception as e:
                                 st.error(f"Erro ao visualizar imagem: {str(e)}")
                 
-                # Mostrar resultados
-                st.success("✅ Documento escaneado com sucesso!")
+                # Guardar o resultado: os reruns seguintes (trocar de página, converter
+                # a imagem em PDF) exibem o mesmo resultado sem refazer o OCR
+                st.session_state[scan_key] = result
                 
-                # Estatísticas
-                col1, col2, col3, col4 = st.columns(4)
-                with col1:
-                    if 'total_pages' in result:
-                        st.metric("Total de Páginas", result.get('total_pages', 0))
-                    else:
-                        st.metric("Tipo", "Imagem")
-                with col2:
-                    st.metric("Palavras", result.get('word_count', result.get('total_words', 0)))
-                with col3:
-                    st.metric("Caracteres", result.get('char_count', result.get('total_chars', 0)))
-                with col4:
-                    confidence = result.get('confidence', result.get('avg_confidence', 0))
-                    st.metric("Confiança OCR", f"{confidence:.1f}%")
-                
-                # Mostrar texto extraído
-                st.subheader("📄 Texto Extraído")
-                
-                if 'pages' in result and len(result['pages']) > 1:
-                    # Múltiplas páginas - mostrar em abas
-                    tabs = st.tabs([f"Página {p}" for p in result['pages'].keys()])
-                    for idx, (page_num, page_data) in enumerate(result['pages'].items()):
-                        with tabs[idx]:
-                            st.text_area(
-                                f"Texto da página {page_num}:",
-                                page_data.get('text', ''),
-                                height=300,
-                                key=f"page_{page_num}"
-                            )
-                            if 'confidence' in page_data:
-                                st.caption(f"Confiança: {page_data['confidence']:.1f}%")
+            except Exception as e:
+                st.error(f"❌ Erro ao escanear documento: {str(e)}")
+                import traceback
+                with st.expander("🔍 Detalhes do erro"):
+                    st.code(traceback.format_exc())
+    
+    if scan_key and scan_key in st.session_state:
+        result = st.session_state[scan_key]
+        file_data = uploaded_file.getvalue()
+        try:
+            # Mostrar resultados
+            st.success("✅ Documento escaneado com sucesso!")
+            
+            # Estatísticas
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                if 'total_pages' in result:
+                    st.metric("Total de Páginas", result.get('total_pages', 0))
                 else:
-                    # Texto único
-                    full_text = result.get('full_text', result.get('text', ''))
-                    st.text_area(
-                        "Texto extraído:",
-                        full_text,
-                        height=400
-                    )
-                
-                # Opções de download
-                st.subheader("💾 Download")
-                
-                # Obter texto completo para download
+                    st.metric("Tipo", "Imagem")
+            with col2:
+                st.metric("Palavras", result.get('word_count', result.get('total_words', 0)))
+            with col3:
+                st.metric("Caracteres", result.get('char_count', result.get('total_chars', 0)))
+            with col4:
+                confidence = result.get('confidence', result.get('avg_confidence', 0))
+                st.metric("Confiança OCR", f"{confidence:.1f}%")
+            
+            # Mostrar texto extraído
+            st.subheader("📄 Texto Extraído")
+            
+            if 'pages' in result and len(result['pages']) > 1:
+                # Múltiplas páginas: um seletor e uma única caixa de texto, em vez de uma
+                # aba por página, que enviaria o texto de todas ao navegador de uma vez
+                page_num = st.selectbox(
+                    "Página:",
+                    list(result['pages'].keys()),
+                    format_func=lambda p: f"Página {p}",
+                    key=f"{scan_key}_page"
+                )
+                page_data = result['pages'][page_num]
+                st.text_area(
+                    f"Texto da página {page_num}:",
+                    page_data.get('text', ''),
+                    height=300,
+                    key=f"page_{page_num}"
+                )
+                if 'confidence' in page_data:
+                    st.caption(f"Confiança: {page_data['confidence']:.1f}%")
+            else:
+                # Texto único
                 full_text = result.get('full_text', result.get('text', ''))
+                st.text_area(
+                    "Texto extraído:",
+                    full_text,
+                    height=400
+                )
+            
+            # Opções de download
+            st.subheader("💾 Download")
+            
+            # Obter texto completo para download
+            full_text = result.get('full_text', result.get('text', ''))
+            
+            # Preparar nomes de arquivo
+            base_name = Path(uploaded_file.name).stem if uploaded_file.name else "documento"
+            output_name = f"texto_extraido_{base_name}.txt"
+            html_name = f"texto_extraido_{base_name}.html"
+            
+            # Usar session_state para manter o PDF criado
+            pdf_key = f"pdf_{base_name}"
+            if pdf_key not in st.session_state:
+                st.session_state[pdf_key] = None
+            pdf_name = st.session_state[pdf_key]
+            
+            # Se for imagem, oferecer opção de converter para PDF
+            if file_type == "Imagem" and uploaded_file:
+                st.info("💡 Você também pode converter esta imagem em PDF!")
                 
-                # Preparar nomes de arquivo
-                base_name = Path(uploaded_file.name).stem if uploaded_file.name else "documento"
-                output_name = f"texto_extraido_{base_name}.txt"
-                html_name = f"texto_extraido_{base_name}.html"
-                
-                # Usar session_state para manter o PDF criado
-                pdf_key = f"pdf_{base_name}"
-                if pdf_key not in st.session_state:
-                    st.session_state[pdf_key] = None
-                pdf_name = st.session_state[pdf_key]
-                
-                # Salvar texto em arquivo
-                with open(output_name, "w", encoding="utf-8") as f:
-                    f.write(full_text)
+                # Criar colunas para botão e preview
+                col_btn, col_preview = st.columns([1, 1])
                 
-                # Se for imagem, oferecer opção de converter para PDF
-                if file_type == "Imagem" and uploaded_file:
-                    st.info("💡 Você também pode converter esta imagem em PDF!")
-                    
-                    # Criar colunas para botão e preview
-                    col_btn, col_preview = st.columns([1, 1])
-                    
-                    with col_btn:
-                        if st.button("📄 Converter Imagem para PDF", type="primary", key="convert_to_pdf"):
-                            try:
-                                # Ler a imagem original do arquivo temporário
-                                if os.path.exists(original_image_path):
-                                    image = Image.open(original_image_path)
-                                else:
-                                    # Se o arquivo foi deletado, tentar recriar do upload
-                                    with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{file_ext}') as tmp_file:
-                                        tmp_file.write(uploaded_file.getvalue())
-                                        original_image_path = tmp_file.name
-                                    image = Image.open(original_image_path)
-                                
-                                # Converter para RGB se necessário
-                                if image.mode in ("RGBA", "P", "LA"):
-                                    image = image.convert("RGB")
-                                
-                                # Criar PDF
-                                pdf_name = f"documento_{base_name}.pdf"
-                                image.save(pdf_name, "PDF", resolution=300.0)
-                                
-                                # Salvar no session_state
-                                st.session_state[pdf_key] = pdf_name
-                                
-                                st.success("✅ PDF criado com sucesso!")
-                                st.rerun()  # Recarregar para mostrar o botão de download
-                            except Exception as e:
-                                st.error(f"❌ Erro ao criar PDF: {str(e)}")
-                                import traceback
-                                with st.expander("🔍 Detalhes do erro"):
-                                    st.code(traceback.format_exc())
-                    
-                    with col_preview:
-                        # Mostrar preview da imagem
+                with col_btn:
+                    if st.button("📄 Converter Imagem para PDF", type="primary", key="convert_to_pdf"):
                         try:
-                            if os.path.exists(original_image_path):
-                                preview_img = Image.open(original_image_path)
-                                st.image(preview_img, caption="Imagem a converter", use_container_width=True, width=200)
-                        except:
-                            pass
-                
-                # Botões de download
-                col1, col2, col3 = st.columns(3)
-                
-                with col1:
-                    with open(output_name, "rb") as file:
-                        st.download_button(
-                            label="📥 Baixar como TXT",
-                            data=file.read(),
-                            file_name=output_name,
-                            mime="text/plain"
-                        )
-                
-                with col2:
-                    # Criar HTML formatado
-                    html_content = f"""<!DOCTYPE html>
+                            # Ler a imagem original direto do upload
+                            image = Image.open(io.BytesIO(file_data))
+                            
+                            # Converter para RGB se necessário
+                            if image.mode in ("RGBA", "P", "LA"):
+                                image = image.convert("RGB")
+                            
+                            # Criar PDF
+                            pdf_name = f"documento_{base_name}.pdf"
+                            image.save(pdf_name, "PDF", resolution=300.0)
+                            
+                            # Salvar no session_state
+                            st.session_state[pdf_key] = pdf_name
+                            
+                            st.success("✅ PDF criado com sucesso!")
+                            st.rerun()  # Recarregar para mostrar o botão de download
+                        except Exception as e:
+                            st.error(f"❌ Erro ao criar PDF: {str(e)}")
+                            import traceback
+                            with st.expander("🔍 Detalhes do erro"):
+                                st.code(traceback.format_exc())
+                
+                with col_preview:
+                    # Mostrar preview da imagem
+                    try:
+                        preview_img = Image.open(io.BytesIO(file_data))
+                        st.image(preview_img, caption="Imagem a converter", use_container_width=True, width=200)
+                    except:
+                        pass
+            
+            # Botões de download
+            col1, col2, col3 = st.columns(3)
+            
+            with col1:
+                # O texto já está em memória; não há por que passá-lo pelo disco
+                st.download_button(
+                    label="📥 Baixar como TXT",
+                    data=full_text.encode("utf-8"),
+                    file_name=output_name,
+                    mime="text/plain"
+                )
+                st.download_button(
+                    label="📦 TXT compactado (.gz)",
+                    data=_gzip_text(full_text),
+                    file_name=f"{output_name}.gz",
+                    mime="application/gzip"
+                )
+            
+            with col2:
+                # Criar HTML formatado; o texto (que pode ter vários MB) é escapado
+                # e escrito direto no buffer, sem montar uma f-string gigante
+                safe_name = html.escape(base_name)
+                html_buffer = io.StringIO()
+                html_buffer.write(f"""<!DOCTYPE html>
 <html lang="pt-br">
 <head>
     <meta charset="utf-8">
-    <title>Texto Extraído - {base_name}</title>
+    <title>Texto Extraído - {safe_name}</title>
     <style>
         body {{ font-family: Arial, sans-serif; padding: 20px; line-height: 1.6; }}
         pre {{ white-space: pre-wrap; word-wrap: break-word; }}
     </style>
 </head>
 <body>
-    <h1>Texto Extraído de: {base_name}</h1>
-    <pre>{full_text.replace('<', '&lt;').replace('>', '&gt;')}</pre>
+    <h1>Texto Extraído de: {safe_name}</h1>
+    <pre>""")
+                html_buffer.write(html.escape(full_text, quote=False))
+                html_buffer.write("""</pre>
 </body>
-</html>"""
-                    with open(html_name, "w", encoding="utf-8") as f:
-                        f.write(html_content)
-                    
-                    with open(html_name, "rb") as file:
+</html>""")
+                html_content = html_buffer.getvalue()
+                st.download_button(
+                    label="📥 Baixar como HTML",
+                    data=html_content.encode("utf-8"),
+                    file_name=html_name,
+                    mime="text/html"
+                )
+                st.download_button(
+                    label="📦 HTML compactado (.gz)",
+                    data=_gzip_text(html_content),
+                    file_name=f"{html_name}.gz",
+                    mime="application/gzip"
+                )
+            
+            with col3:
+                # Download do PDF se foi criado
+                if pdf_name and os.path.exists(pdf_name):
+                    with open(pdf_name, "rb") as file:
                         st.download_button(
-                            label="📥 Baixar como HTML",
+                            label="📥 Baixar PDF",
                             data=file.read(),
-                            file_name=html_name,
-                            mime="text/html"
+                            file_name=pdf_name,
+                            mime="application/pdf"
                         )
-                
-                with col3:
-                    # Download do PDF se foi criado
-                    if pdf_name and os.path.exists(pdf_name):
-                        with open(pdf_name, "rb") as file:
-                            st.download_button(
-                                label="📥 Baixar PDF",
-                                data=file.read(),
-                                file_name=pdf_name,
-                                mime="application/pdf"
-                            )
-                    elif file_type == "Imagem":
-                        st.caption("Clique em 'Converter Imagem para PDF' acima")
-                
-                # Limpar arquivos temporários (mas manter se for imagem para conversão PDF)
-                # O arquivo será limpo na próxima execução ou quando a sessão terminar
-                
-            except Exception as e:
-                st.error(f"❌ Erro ao escanear documento: {str(e)}")
-                import traceback
-                with st.expander("🔍 Detalhes do erro"):
-                    st.code(traceback.format_exc())
-            finally:
-                # Limpar arquivos gerados após um tempo (não imediatamente para permitir download)
-                # Em produção, você pode usar um sistema de limpeza automática
-                pass
+                elif file_type == "Imagem":
+                    st.caption("Clique em 'Converter Imagem para PDF' acima")
+            
+        except Exception as e:
+            st.error(f"❌ Erro ao exibir resultado: {str(e)}")
+            import traceback
+            with st.expander("🔍 Detalhes do erro"):
+                st.code(traceback.format_exc())
 
 if __name__ == "__main__":
     main()
@@ -6,6 +6,8 @@ Script para executar a aplicação Streamlit localmente
 import subprocess
 import sys
 import os
+from importlib.metadata import version, PackageNotFoundError
+from importlib.util import find_spec
 
 def main():
     """Executa a aplicação Streamlit"""
@@ -17,40 +19,39 @@ def main():
         print("   python run_local.py")
         sys.exit(1)
     
-    # Verificar se streamlit está instalado
+    # Verificar se streamlit está instalado; a versão vem dos metadados do pacote,
+    # sem importar o Streamlit (que será carregado no processo da aplicação)
     try:
-        import streamlit
-        print(f"✅ Streamlit {streamlit.__version__} encontrado")
-    except ImportError:
+        print(f"✅ Streamlit {version('streamlit')} encontrado")
+    except PackageNotFoundError:
         print("❌ Streamlit não encontrado. Instalando...")
         subprocess.run([sys.executable, "-m", "pip", "install", "streamlit"])
     
-    # Verificar dependências
+    # Verificar dependências; find_spec só localiza o pacote, sem executá-lo
+    # (a aplicação vai importá-los de novo no processo do Streamlit)
     print("🔍 Verificando dependências...")
-    try:
-        import pypdf
-        import pdf2image
-        import PIL
-        print("✅ Dependências principais encontradas")
-    except ImportError as e:
-        print(f"❌ Dependência faltando: {e}")
+    missing = [name for name in ("pypdf", "pdf2image", "PIL") if find_spec(name) is None]
+    if missing:
+        print(f"❌ Dependência faltando: {', '.join(missing)}")
         print("   Execute: pip install -r requirements.txt")
         sys.exit(1)
+    print("✅ Dependências principais encontradas")
     
     # Executar Streamlit
     print("🚀 Iniciando aplicação Streamlit...")
     print("   Acesse: http://localhost:8501")
     print("   Pressione Ctrl+C para parar")
     
+    # Substituir este processo pelo do Streamlit, em vez de esperar por um filho:
+    # o Ctrl+C chega direto ao Streamlit, que cuida do encerramento
+    sys.stdout.flush()
     try:
-        subprocess.run([
+        os.execvp(sys.executable, [
             sys.executable, "-m", "streamlit", "run", "app.py",
             "--server.headless", "true",
             "--server.port", "8501"
         ])
-    except KeyboardInterrupt:
-        print("\n👋 Aplicação encerrada pelo usuário")
-    except Exception as e:
+    except OSError as e:
         print(f"❌ Erro ao executar: {e}")
         sys.exit(1)
 
@@ -0,0 +1,71 @@
+"""Imagens → PDF: o img2pdf e o fallback do Pillow devem gerar páginas do mesmo tamanho."""
+
+import importlib.util
+import io
+import logging
+import os
+import unittest
+
+from PIL import Image
+from pypdf import PdfReader
+
+logging.disable(logging.WARNING)
+_APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pdf-app.py")
+_spec = importlib.util.spec_from_file_location("pdf_app", _APP_PATH)
+app = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(app)
+
+
+def _image_bytes(size, fmt, **save_args):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "white").save(buffer, fmt, **save_args)
+    return buffer.getvalue()
+
+
+def _media_boxes(pdf_data):
+    return [
+        tuple(round(float(v), 2) for v in page.mediabox)
+        for page in PdfReader(io.BytesIO(pdf_data)).pages
+    ]
+
+
+class ImagesToPdfPageSizeTest(unittest.TestCase):
+
+    def _convert(self, images, target_dpi, use_img2pdf):
+        original = app.IMG2PDF_AVAILABLE
+        app.IMG2PDF_AVAILABLE = use_img2pdf
+        try:
+            app._convert_images_to_pdf_impl.clear()
+            return app._convert_images_to_pdf_impl(images, target_dpi)
+        finally:
+            app.IMG2PDF_AVAILABLE = original
+            app._convert_images_to_pdf_impl.clear()
+
+    def assertSameMediaBox(self, images, target_dpi, expected):
+        if not app.IMG2PDF_AVAILABLE:
+            self.skipTest("img2pdf não instalado")
+        with_img2pdf = _media_boxes(self._convert(images, target_dpi, True))
+        with_pillow = _media_boxes(self._convert(images, target_dpi, False))
+        self.assertEqual(with_img2pdf, with_pillow)
+        self.assertEqual(with_img2pdf, expected)
+
+    def test_images_without_dpi_keep_one_point_per_pixel(self):
+        images = [_image_bytes((4000, 3000), "JPEG"), _image_bytes((200, 300), "PNG")]
+        self.assertSameMediaBox(images, None, [(0, 0, 4000, 3000), (0, 0, 200, 300)])
+
+    def test_dpi_metadata_is_ignored_like_pillow(self):
+        images = [_image_bytes((600, 900), "JPEG", dpi=(300, 300))]
+        self.assertSameMediaBox(images, None, [(0, 0, 600, 900)])
+
+    def test_target_dpi_applies_only_to_resized_images(self):
+        # A 150 dpi, uma página A4 comporta 1240x1754 px: só a primeira imagem é reduzida
+        images = [_image_bytes((2480, 3508), "JPEG"), _image_bytes((200, 300), "PNG")]
+        self.assertSameMediaBox(images, 150, [(0, 0, 595.2, 841.92), (0, 0, 200, 300)])
+
+    def test_small_images_keep_native_size_with_target_dpi(self):
+        images = [_image_bytes((200, 300), "PNG")]
+        self.assertSameMediaBox(images, 150, [(0, 0, 200, 300)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+"""Mesclagem com o pypdf: cada PDF de entrada é analisado uma única vez."""
+
+import importlib.util
+import io
+import logging
+import os
+import unittest
+from unittest import mock
+
+from pypdf import PdfReader, PdfWriter
+
+logging.disable(logging.WARNING)
+_APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pdf-app.py")
+_spec = importlib.util.spec_from_file_location("pdf_app", _APP_PATH)
+app = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(app)
+
+
+def _blank_pdf(pages):
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(100, 100)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+class MergeWithPypdfTest(unittest.TestCase):
+
+    def test_each_input_is_parsed_once(self):
+        pdfs = [_blank_pdf(n) for n in (1, 2, 3, 4, 5, 6)]
+        with mock.patch.object(app, "PdfReader", wraps=PdfReader) as reader_cls:
+            merged = app._merge_with_pypdf(pdfs)
+        self.assertEqual(reader_cls.call_count, len(pdfs))
+        self.assertEqual(len(PdfReader(io.BytesIO(merged)).pages), 21)
+
+
+if __name__ == "__main__":
+    unittest.main()